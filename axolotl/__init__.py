@@ -1,10 +1,33 @@
-import logging
+import importlib
+from typing import TYPE_CHECKING
 
 import dotenv
 
+# Loaded once here, before any submodule reads its settings from the environment.
 dotenv.load_dotenv()
-logging.basicConfig(level=logging.CRITICAL)  # here to prevent log.WARN clutter
 
-from .backup_and_restore.client import BackupAndRestoreClient
+# The clients are imported on first use, and CLI commands import them when
+# they run, so `import axolotl`, `--help` and shell completion do not wait for
+# pymongo.
+_LAZY = {
+    "AsyncBackupAndRestoreClient": ".backup_and_restore.async_client",
+    "BackupAndRestoreClient": ".backup_and_restore.client",
+}
 
-__all__ = ["BackupAndRestoreClient"]
+if TYPE_CHECKING:
+    from .backup_and_restore.async_client import AsyncBackupAndRestoreClient
+    from .backup_and_restore.client import BackupAndRestoreClient
+
+__all__ = ["AsyncBackupAndRestoreClient", "BackupAndRestoreClient"]
+
+
+def __getattr__(name: str):
+    if name not in _LAZY:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted([*globals(), *__all__])
@@ -1,11 +1,37 @@
+import logging
+from typing import Annotated, Optional
+
 import typer
+from typer import Option
 
 from .backup_and_restore import backup_and_restore
+from .backup_and_restore.metrics import JsonlMetricsFile, PrometheusTextfile, add_hook
 from .db_utils import db_utils
 
 
+# No docstring: Typer would show it as the description of `axolotl --help`.
+def metrics_options(
+    metrics_file: Annotated[
+        Optional[str],
+        Option("--metrics-file", help="Append metric events to this JSON-lines file."),
+    ] = None,
+    prometheus_textfile: Annotated[
+        Optional[str],
+        Option(
+            "--prometheus-textfile",
+            help="Keep the latest metrics in this Prometheus textfile.",
+        ),
+    ] = None,
+):
+    if metrics_file is not None:
+        add_hook(JsonlMetricsFile(metrics_file))
+    if prometheus_textfile is not None:
+        add_hook(PrometheusTextfile(prometheus_textfile))
+
+
 def main():
-    app = typer.Typer()
+    logging.basicConfig(level=logging.CRITICAL)  # here to prevent log.WARN clutter
+    app = typer.Typer(callback=metrics_options)
     app.add_typer(backup_and_restore.app, name="backup-and-restore")
     app.add_typer(db_utils.app, name="db-utils")
     app()
@@ -0,0 +1,363 @@
+import asyncio
+import os
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Optional
+
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+from pymongo import ASCENDING, DESCENDING, AsyncMongoClient
+from pymongo.asynchronous.collection import AsyncCollection
+from pymongo.errors import BulkWriteError, OperationFailure
+
+from .batching import BATCH_SIZE
+from .checkpoint import Checkpoint, OrderedProgress
+from .client import (
+    backup_state,
+    dump_files,
+    id_range_query,
+    id_type,
+    iter_dump_batches,
+    list_dumps,
+    report_summary,
+)
+from .connections import resolve_cluster
+from .formats import DumpWriter, dump_name
+from .manifest import stale_dumps
+
+
+async def iter_id_batches(
+    collection: AsyncCollection,
+    filter: dict,
+    batch_size: int,
+    offset: int = 0,
+    limit: int = -1,
+    after_id: Optional[Any] = None,
+) -> AsyncIterator[list]:
+    """Async version of `client.iter_id_batches`, one query per batch in `_id` order."""
+    last_id = after_id
+    remaining = limit
+    while remaining != 0:
+        size = batch_size if remaining == -1 else min(batch_size, remaining)
+        cursor = collection.find(
+            filter=id_range_query(filter, last_id),
+            sort=[("_id", ASCENDING)],
+            skip=offset if last_id is None else 0,
+            limit=size,
+            batch_size=size,
+        )
+        batch = await cursor.to_list()
+        if not batch:
+            break
+        yield batch
+        last_id = batch[-1]["_id"]
+        if remaining != -1:
+            remaining -= len(batch)
+        if len(batch) < size:
+            break
+
+
+async def iter_cursor_batches(
+    collection: AsyncCollection,
+    filter: dict,
+    batch_size: int,
+    skip: int = 0,
+    limit: int = -1,
+) -> AsyncIterator[list]:
+    """Batches of a single cursor in `_id` order, for `_id`s of several types."""
+    if limit == 0:
+        return
+    cursor = collection.find(
+        filter=filter,
+        sort=[("_id", ASCENDING)],
+        skip=skip,
+        limit=max(limit, 0),
+        batch_size=batch_size,
+    )
+    batch = []
+    async for document in cursor:
+        batch.append(document)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def mixed_id_types(collection: AsyncCollection, filter: dict) -> bool:
+    """Async version of `client.mixed_id_types`."""
+    first = await collection.find_one(filter, {"_id": 1}, sort=[("_id", ASCENDING)])
+    if first is None:
+        return False
+    last = await collection.find_one(filter, {"_id": 1}, sort=[("_id", DESCENDING)])
+    return id_type(first["_id"]) != id_type(last["_id"])
+
+
+class AsyncBackupAndRestoreClient:
+    """asyncio counterpart of `BackupAndRestoreClient`, reading the same dumps."""
+
+    def __init__(self, db_uir: Optional[str] = None, concurrency: int = 4) -> None:
+        # Async clients belong to an event loop, so they are not shared.
+        uri, options = resolve_cluster(db_uir)
+        self.client = AsyncMongoClient(uri, **options)
+        self.semaphore = asyncio.Semaphore(concurrency)
+
+    async def backup_collection(
+        self,
+        db: str,
+        collection: str,
+        path: str,
+        dry_run: bool = False,
+        offset: int = 0,
+        limit: int = -1,
+        filters: Optional[dict] = None,
+        resume: bool = False,
+        format: str = "json",
+        compression: str = "none",
+    ) -> int:
+        path = Path(path)
+        source = self.client[db][collection]
+        filter = {} if filters is None else filters
+        offset = max(offset, 0)
+        async with self.semaphore:
+            if filter:
+                num_docs = await source.count_documents(filter=filter)
+            else:
+                num_docs = await source.estimated_document_count()
+            if dry_run:
+                print(f"Number of documents in collection: {num_docs}.\n")
+                return 0
+            print(f"Number of documents in collection: {num_docs}.")
+
+            file = path / dump_name(collection, format, compression)
+            checkpoint = Checkpoint(file)
+            state = checkpoint.load() if resume else None
+            if state is None:
+                # A fresh backup replaces the files of a previous one.
+                path.mkdir(parents=True, exist_ok=True)
+                for stale in stale_dumps(path, collection):
+                    stale.unlink(missing_ok=True)
+                state = backup_state(offset=offset)
+                checkpoint.save(state)
+            elif state["complete"]:
+                print(f"'{file}' is already complete.")
+                return state["documents"]
+            elif file.exists():
+                os.truncate(file, state["bytes"])
+
+            if format == "bson":
+                source = source.with_options(
+                    codec_options=CodecOptions(document_class=RawBSONDocument)
+                )
+            remaining = -1 if limit == -1 else limit - state["documents"]
+            if await mixed_id_types(source, filter):
+                # `_id` range queries only match one type, so read a single cursor.
+                batches = iter_cursor_batches(
+                    source,
+                    filter,
+                    BATCH_SIZE,
+                    skip=state["offset"] + state["documents"],
+                    limit=remaining,
+                )
+            else:
+                batches = iter_id_batches(
+                    source,
+                    filter,
+                    BATCH_SIZE,
+                    offset=state["offset"],
+                    limit=remaining,
+                    after_id=state["last_id"],
+                )
+            with DumpWriter(file, format=format, compression=compression) as writer:
+
+                def write(documents: list):
+                    state["bytes"] = writer.write(documents)
+                    state["documents"] += len(documents)
+                    state["last_id"] = documents[-1]["_id"]
+                    checkpoint.save(state)
+
+                # The next batch is queried while the current one is written.
+                next_batch = asyncio.ensure_future(anext(batches, None))
+                try:
+                    while (documents := await next_batch) is not None:
+                        next_batch = asyncio.ensure_future(anext(batches, None))
+                        await asyncio.to_thread(write, documents)
+                        print(f"Downloaded {state['documents']}/{num_docs} documents.")
+                finally:
+                    next_batch.cancel()
+            state["complete"] = True
+            checkpoint.save(state)
+            print(f"Saved them to '{path}'.\n")
+            return state["documents"]
+
+    async def restore_collection(
+        self,
+        db: str,
+        collection: str,
+        path: str,
+        dry_run: bool = False,
+        offset: int = 0,
+        limit: int = -1,
+        workers: int = 1,
+        resume: bool = False,
+    ) -> int:
+        """Restore a dump into `db.collection` with `workers` inserts in flight."""
+        path = Path(path)
+        target = self.client[db][collection]
+        if dry_run:
+            print(f" Will Restore documents from '{path}'.")
+            return 0
+        files = dump_files(path)
+        if len(files) > 1 and (offset != 0 or limit != -1):
+            raise ValueError(
+                "Offset and limit are not supported for partitioned dumps."
+            )
+
+        total = 0
+        in_flight = asyncio.Semaphore(max(workers, 1))
+
+        async def insert(documents: list, progress: OrderedProgress, seq: int, state):
+            nonlocal total
+            try:
+                result = await target.insert_many(documents, ordered=False)
+                inserted = len(result.inserted_ids)
+            except BulkWriteError as e:
+                errors = e.details["writeErrors"]
+                if not resume or any(err["code"] != 11000 for err in errors):
+                    raise
+                inserted = e.details["nInserted"]
+            finally:
+                in_flight.release()
+            progress.done(seq, state)
+            total += inserted
+            print(f"Restored {total} documents so far.")
+
+        async with self.semaphore, asyncio.TaskGroup() as inserts:
+            for file in files:
+                checkpoint = Checkpoint(file, "restore-checkpoint")
+                state = checkpoint.load() if resume else None
+                skip = 0
+                if state is None:
+                    state = {
+                        "target": target.full_name,
+                        "bytes": 0,
+                        "lines": 0,
+                        "complete": False,
+                    }
+                    skip = offset
+                elif state["target"] != target.full_name:
+                    raise ValueError(
+                        f"'{checkpoint.path}' belongs to a restore "
+                        f"into '{state['target']}'."
+                    )
+                elif state["complete"]:
+                    print(f"'{file}' is already restored.")
+                    continue
+
+                progress = OrderedProgress(checkpoint.save)
+                batches = iter_dump_batches(
+                    file,
+                    offset=skip,
+                    limit=-1 if limit == -1 else max(limit - state["lines"], 0),
+                    start=state["bytes"],
+                )
+                seq = 0
+                while True:
+                    await in_flight.acquire()
+                    batch = await asyncio.to_thread(next, batches, None)
+                    if batch is None:
+                        in_flight.release()
+                        break
+                    documents, end = batch
+                    state = {
+                        **state,
+                        "bytes": end,
+                        "lines": state["lines"] + len(documents),
+                    }
+                    inserts.create_task(insert(documents, progress, seq, state))
+                    seq += 1
+                progress.done(seq, {**state, "complete": True})
+        return total
+
+    async def backup_db(
+        self,
+        db: str,
+        path: str,
+        dry_run: bool = False,
+        resume: bool = False,
+        format: str = "json",
+        compression: str = "none",
+    ) -> list[dict]:
+        """Back up every collection of `db` concurrently, largest first."""
+        path = f"{path}{db}" if path.endswith("/") else f"{path}/{db}"
+        print(f"Backing up database '{db}' to '{path}'.\n")
+        names = await self.client[db].list_collection_names()
+        sizes = {name: await self.collection_size(db, name) for name in names}
+        tasks = {
+            name: self.backup_collection(
+                db,
+                name,
+                path,
+                dry_run=dry_run,
+                resume=resume,
+                format=format,
+                compression=compression,
+            )
+            for name in names
+        }
+        return await run_largest_first(tasks, sizes)
+
+    async def collection_size(self, db: str, collection: str) -> int:
+        try:
+            return (await self.client[db].command("collStats", collection))["size"]
+        except OperationFailure:  # views have no stats
+            return 0
+
+    async def restore_db(
+        self,
+        db: str,
+        path: str,
+        dry_run: bool = False,
+        workers: int = 1,
+        resume: bool = False,
+    ) -> list[dict]:
+        """Restore every collection under `path/db` concurrently, largest first."""
+        path = f"{path}{db}/" if path.endswith("/") else f"{path}/{db}/"
+        print(f"Restoring '{path}' to database '{db}'.\n")
+        dumps = list_dumps(path)
+        tasks = {
+            name: self.restore_collection(
+                db, name, dump, dry_run=dry_run, workers=workers, resume=resume
+            )
+            for name, dump in dumps
+        }
+        sizes = {
+            name: sum(file.stat().st_size for file in dump_files(dump))
+            for name, dump in dumps
+        }
+        return await run_largest_first(tasks, sizes)
+
+
+async def run_largest_first(
+    tasks: dict[str, Awaitable[int]],
+    sizes: dict[str, int],
+) -> list[dict]:
+    """Await every collection task, largest first, like `client.run_largest_first`."""
+
+    async def run(name: str, task: Awaitable[int]) -> dict:
+        start = time.perf_counter()
+        try:
+            documents, error = await task, None
+        except Exception as e:
+            documents, error = 0, e
+        return {
+            "collection": name,
+            "documents": documents,
+            "seconds": round(time.perf_counter() - start, 3),
+            "error": None if error is None else str(error),
+        }
+
+    # Tasks queue on the client's semaphore in the order they are started.
+    names = sorted(tasks, key=lambda name: sizes[name], reverse=True)
+    summary = await asyncio.gather(*(run(name, tasks[name]) for name in names))
+    return report_summary(list(summary))
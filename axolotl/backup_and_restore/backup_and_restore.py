@@ -1,14 +1,51 @@
 from typing import Annotated, Optional
 
 import typer
+from bson import json_util
 from rich import print
 from typer import Option
 
-from .client import BackupAndRestoreClient
+from .compression import Compression
+from .formats import DumpFormat
 
 app = typer.Typer()
 
 
+def parse_write_concern(w: Optional[str]) -> Optional[int | str]:
+    """Parse a `w` write concern, either a number of nodes or a tag like "majority"."""
+    if w is None:
+        return None
+    return int(w) if w.isdigit() else w
+
+
+def parse_query(value: Optional[str]) -> Optional[dict]:
+    """Parse a filter or projection given as (Extended) JSON, e.g. '{"age": {"$gt": 3}}'."""
+    if value is None:
+        return None
+    return json_util.loads(value)
+
+
+def parse_sort(value: Optional[str]) -> Optional[list[tuple]]:
+    """Parse a sort given as a JSON object, e.g. '{"age": -1, "_id": 1}', keeping its order."""
+    if value is None:
+        return None
+    return list(json_util.loads(value).items())
+
+
+def parse_hint(value: Optional[str]) -> Optional[str | list[tuple]]:
+    """Parse a hint, either an index name or its key pattern as a JSON object."""
+    if value is None or not value.lstrip().startswith("{"):
+        return value
+    return parse_sort(value)
+
+
+def format_value(dump_format: Optional[DumpFormat], incremental: bool) -> str:
+    """The dump format to write: json by default, extjson for incremental backups."""
+    if dump_format is not None:
+        return dump_format.value
+    return DumpFormat.extjson.value if incremental else DumpFormat.json.value
+
+
 @app.command()
 def backup_collection(
     db: Annotated[str, Option("-db", "--database")],
@@ -16,17 +53,53 @@ def backup_collection(
     path: Annotated[str, Option("-p", "--path")],
     offset: Annotated[int, Option("-o", "--offset")] = 0,
     limit: Annotated[int, Option("-l", "--limit")] = -1,
+    workers: Annotated[int, Option("-w", "--workers")] = 1,
+    resume: Annotated[bool, Option("--resume")] = False,
+    dump_format: Annotated[Optional[DumpFormat], Option("-f", "--format")] = None,
+    compression: Annotated[Compression, Option("--compression")] = Compression.none,
+    incremental: Annotated[bool, Option("--incremental")] = False,
+    watermark_field: Annotated[Optional[str], Option("--watermark-field")] = None,
+    index: Annotated[bool, Option("--index")] = False,
+    chunk_mb: Annotated[int, Option("--chunk-mb")] = 0,
+    filter: Annotated[Optional[str], Option("--filter")] = None,
+    projection: Annotated[Optional[str], Option("--projection")] = None,
+    sort: Annotated[Optional[str], Option("--sort")] = None,
+    hint: Annotated[Optional[str], Option("--hint")] = None,
     dryrun: Annotated[bool, Option("-dryrun")] = False,
 ):
+    from .client import BackupAndRestoreClient
+
     try:
-        BackupAndRestoreClient().backup_collection(
-            db=db,
-            collection=collection,
-            path=path,
-            dry_run=dryrun,
-            offset=offset,
-            limit=limit,
-        )
+        client = BackupAndRestoreClient()
+        if incremental:
+            client.backup_collection_incremental(
+                db=db,
+                collection=collection,
+                path=path,
+                dry_run=dryrun,
+                watermark_field=watermark_field,
+                format=format_value(dump_format, incremental),
+                compression=compression.value,
+            )
+        else:
+            client.backup_collection(
+                db=db,
+                collection=collection,
+                path=path,
+                dry_run=dryrun,
+                offset=offset,
+                limit=limit,
+                workers=workers,
+                resume=resume,
+                format=format_value(dump_format, incremental),
+                compression=compression.value,
+                index=index,
+                filters=parse_query(filter),
+                projection=parse_query(projection),
+                sort=parse_sort(sort),
+                hint=parse_hint(hint),
+                chunk_size=chunk_mb << 20,
+            )
         if not dryrun:
             print(f"Backed up collection '{collection}' to '{path}'.")
         else:
@@ -42,17 +115,47 @@ def restore_collection(
     path: Annotated[str, Option("-p", "--path")],
     offset: Annotated[int, Option("-o", "--offset")] = 0,
     limit: Annotated[int, Option("-l", "--limit")] = -1,
+    workers: Annotated[int, Option("-w", "--workers")] = 1,
+    write_concern: Annotated[Optional[str], Option("--write-concern")] = None,
+    journal: Annotated[bool, Option("--journal")] = False,
+    bypass_validation: Annotated[bool, Option("--bypass-document-validation")] = False,
+    resume: Annotated[bool, Option("--resume")] = False,
+    processes: Annotated[int, Option("-P", "--processes")] = 0,
+    indexes: Annotated[bool, Option("--indexes/--no-indexes")] = True,
+    index_workers: Annotated[int, Option("--index-workers")] = 1,
+    incremental: Annotated[bool, Option("--incremental")] = False,
     dryrun: Annotated[bool, Option("-dryrun")] = False,
 ):
+    from .client import BackupAndRestoreClient
+
     try:
-        BackupAndRestoreClient().restore_collection(
-            db=db,
-            collection=collection,
-            path=path,
-            offset=offset,
-            limit=limit,
-            dry_run=dryrun,
-        )
+        client = BackupAndRestoreClient()
+        if incremental:
+            # `path` is the backup directory holding the base and its deltas.
+            client.restore_collection_incremental(
+                db=db,
+                collection=collection,
+                path=path,
+                dry_run=dryrun,
+                workers=workers,
+            )
+        else:
+            client.restore_collection(
+                db=db,
+                collection=collection,
+                path=path,
+                offset=offset,
+                limit=limit,
+                dry_run=dryrun,
+                workers=workers,
+                write_concern=parse_write_concern(write_concern),
+                journal=journal or None,
+                bypass_document_validation=bypass_validation,
+                resume=resume,
+                processes=processes,
+                indexes=indexes,
+                index_workers=index_workers,
+            )
         if not dryrun:
             print(f"Restored collection '{collection}' to '{path}'.")
         else:
@@ -65,10 +168,32 @@ def restore_collection(
 def backup_database(
     db: Annotated[str, Option("-db", "--database")],
     path: Annotated[str, Option("-p", "--path")],
+    jobs: Annotated[int, Option("-j", "--jobs")] = 1,
+    resume: Annotated[bool, Option("--resume")] = False,
+    dump_format: Annotated[Optional[DumpFormat], Option("-f", "--format")] = None,
+    compression: Annotated[Compression, Option("--compression")] = Compression.none,
+    incremental: Annotated[bool, Option("--incremental")] = False,
+    watermark_field: Annotated[Optional[str], Option("--watermark-field")] = None,
+    index: Annotated[bool, Option("--index")] = False,
+    chunk_mb: Annotated[int, Option("--chunk-mb")] = 0,
     dryrun: Annotated[bool, Option("-dryrun")] = False,
 ):
+    from .client import BackupAndRestoreClient
+
     try:
-        BackupAndRestoreClient().backup_db(db=db, path=path, dry_run=dryrun)
+        BackupAndRestoreClient().backup_db(
+            db=db,
+            path=path,
+            dry_run=dryrun,
+            jobs=jobs,
+            resume=resume,
+            format=format_value(dump_format, incremental),
+            compression=compression.value,
+            incremental=incremental,
+            watermark_field=watermark_field,
+            index=index,
+            chunk_size=chunk_mb << 20,
+        )
         if not dryrun:
             print(f"Backed up database '{db}' to '{path}'.")
         else:
@@ -81,10 +206,30 @@ def backup_database(
 def restore_database(
     db: Annotated[str, Option("-db", "--database")],
     path: Annotated[str, Option("-p", "--path")],
+    jobs: Annotated[int, Option("-j", "--jobs")] = 1,
+    workers: Annotated[int, Option("-w", "--workers")] = 1,
+    resume: Annotated[bool, Option("--resume")] = False,
+    processes: Annotated[int, Option("-P", "--processes")] = 0,
+    indexes: Annotated[bool, Option("--indexes/--no-indexes")] = True,
+    index_workers: Annotated[int, Option("--index-workers")] = 1,
+    verify: Annotated[bool, Option("--verify/--no-verify")] = True,
     dryrun: Annotated[bool, Option("-dryrun")] = False,
 ):
+    from .client import BackupAndRestoreClient
+
     try:
-        BackupAndRestoreClient().restore_db(db=db, path=path, dry_run=dryrun)
+        BackupAndRestoreClient().restore_db(
+            db=db,
+            path=path,
+            dry_run=dryrun,
+            jobs=jobs,
+            workers=workers,
+            resume=resume,
+            processes=processes,
+            indexes=indexes,
+            index_workers=index_workers,
+            verify=verify,
+        )
         if not dryrun:
             print(f"Restored '{path}' to databese'{db}'.")
         else:
@@ -0,0 +1,79 @@
+import os
+import threading
+from typing import Iterable, Iterator, Optional
+
+# Batches start at BATCH_SIZE documents and, unless ADAPTIVE_BATCHES=0, adapt
+# to take BATCH_SECONDS each, within MAX_BATCH_SIZE and MAX_BATCH_BYTES.
+BATCH_SIZE = int(os.getenv("BATCH_SIZE", 512))
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", 50_000))
+MAX_BATCH_BYTES = int(os.getenv("MAX_BATCH_BYTES", 16 << 20))
+BATCH_SECONDS = float(os.getenv("BATCH_SECONDS", 0.5))
+ADAPTIVE_BATCHES = os.getenv("ADAPTIVE_BATCHES", "1") != "0"
+
+
+class BatchSizer:
+    """Size the next batch from the size and latency of the last ones."""
+
+    def __init__(
+        self,
+        size: int = BATCH_SIZE,
+        max_size: int = MAX_BATCH_SIZE,
+        max_bytes: int = MAX_BATCH_BYTES,
+        target_seconds: float = BATCH_SECONDS,
+        adaptive: bool = ADAPTIVE_BATCHES,
+    ) -> None:
+        self.size = max(size, 1)
+        self.max_size = max(max_size, self.size)
+        self.max_bytes = max_bytes
+        self.target_seconds = target_seconds
+        self.adaptive = adaptive
+        self.document_bytes: Optional[float] = None
+        self.lock = threading.Lock()
+
+    def next_size(self) -> int:
+        """Number of documents in the next batch."""
+        with self.lock:
+            if not self.document_bytes:
+                return self.size
+            return max(min(self.size, int(self.max_bytes / self.document_bytes)), 1)
+
+    def observe(self, documents: int, size: int, seconds: float):
+        """Account for a batch of `documents` documents and `size` bytes that took `seconds`."""
+        if documents == 0:
+            return
+        with self.lock:
+            if size:
+                average = size / documents
+                if self.document_bytes is None:
+                    self.document_bytes = average
+                else:  # moving average, so one odd batch does not swing the size
+                    self.document_bytes = 0.8 * self.document_bytes + 0.2 * average
+            if not self.adaptive or documents < self.size // 2:
+                return  # a partial batch, e.g. the last one, says little
+            if seconds < self.target_seconds / 2:
+                self.size = min(self.size * 2, self.max_size)
+            elif seconds > self.target_seconds:
+                scale = max(self.target_seconds / seconds, 0.5)
+                self.size = max(int(self.size * scale), 1)
+
+
+def iter_sized_batches(
+    records: Iterable[bytes],
+    sizer: BatchSizer,
+    limit: int = -1,
+) -> Iterator[list[bytes]]:
+    """Group encoded `records` into batches of the sizer's count and byte limits."""
+    remaining = limit
+    batch, size, count = [], 0, sizer.next_size()
+    for record in records:
+        if remaining == 0:
+            break
+        batch.append(record)
+        size += len(record)
+        if remaining != -1:
+            remaining -= 1
+        if len(batch) >= count or size >= sizer.max_bytes:
+            yield batch
+            batch, size, count = [], 0, sizer.next_size()
+    if batch:
+        yield batch
@@ -0,0 +1,55 @@
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Optional
+
+from bson import json_util
+from bson.json_util import RELAXED_JSON_OPTIONS
+
+
+class Checkpoint:
+    """
+    Progress of a backup or restore, kept in a JSON sidecar next to the dump.
+
+    State is written as Extended JSON, so `_id`s keep their type,
+    and replaced atomically, so a crash leaves either the old or the new state.
+    """
+
+    def __init__(self, dump: Path, kind: str = "checkpoint") -> None:
+        self.path = dump.with_name(f"{dump.name}.{kind}.json")
+
+    def load(self) -> Optional[dict]:
+        if not self.path.exists():
+            return None
+        return json_util.loads(self.path.read_text())
+
+    def save(self, state: dict):
+        tmp = self.path.with_name(f"{self.path.name}.tmp")
+        tmp.write_text(json_util.dumps(state, json_options=RELAXED_JSON_OPTIONS))
+        os.replace(tmp, self.path)
+
+
+class OrderedProgress:
+    """
+    Track the completed prefix of batches that may finish out of order.
+
+    `done(seq, state)` marks batch `seq` as finished. `on_advance` is called
+    with the state of the last batch of the contiguous completed prefix
+    whenever that prefix grows.
+    """
+
+    def __init__(self, on_advance: Callable[[dict], None]) -> None:
+        self.on_advance = on_advance
+        self.next_seq = 0
+        self.finished = {}
+        self.lock = threading.Lock()
+
+    def done(self, seq: int, state: dict):
+        with self.lock:
+            self.finished[seq] = state
+            advanced = None
+            while self.next_seq in self.finished:
+                advanced = self.finished.pop(self.next_seq)
+                self.next_seq += 1
+            if advanced is not None:
+                self.on_advance(advanced)
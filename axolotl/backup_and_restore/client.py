@@ -1,32 +1,67 @@
 import glob
 import json
 import os
-from datetime import datetime
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
-from typing import Iterable, Iterator, Optional, TypeVar
+from typing import Any, Callable, Iterable, Iterator, Optional, TypeVar
 
-import dotenv
-import numpy as np
-from bson.objectid import ObjectId
-from pymilvus import Collection, connections
-from pymongo import MongoClient
-
-dotenv.load_dotenv()
-BATCH_SIZE = int(os.getenv("BATCH_SIZE", 512))
-T = TypeVar("T")
+from bson.codec_options import CodecOptions
+from bson.decimal128 import Decimal128
+from bson.raw_bson import RawBSONDocument
+from pymongo import ASCENDING, DESCENDING
+from pymongo.collection import Collection as MongoCollection
+from pymongo.errors import BulkWriteError, OperationFailure
+from pymongo.write_concern import WriteConcern
 
+from .batching import BATCH_SIZE, BatchSizer, iter_sized_batches
+from .checkpoint import Checkpoint, OrderedProgress
+from .compression import SUFFIXES, detect_compression, iter_decompressed_blocks
+from .connections import get_client
+from .decoding import iter_decoded_batches
+from .formats import (
+    EXTENSIONS,
+    CustomJSONEncoder,
+    DumpWriter,
+    decode_record,
+    dump_collection,
+    dump_format,
+    dump_name,
+    split_records,
+)
+from .index import MappedDump
+from .incremental import (
+    iter_stream_changes,
+    iter_watermark_changes,
+    record_operation,
+)
+from .manifest import (
+    chunk_entry,
+    chunk_name,
+    download_backup,
+    load_db_manifest,
+    save_collection_manifest,
+    save_db_manifest,
+    stale_dumps,
+    upload_backup,
+    verify_chunk,
+)
+from .metadata import build_indexes, create_collection, load_metadata, save_metadata
+from .metrics import Metrics
+from .pipeline import run_pipeline
+from .storage import (
+    REMOTE_CHUNK_SIZE,
+    Storage,
+    Uploader,
+    is_remote,
+    open_storage,
+    staging_dir,
+)
 
-class CustomJSONEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, datetime):
-            return obj.isoformat()
-        elif isinstance(obj, ObjectId):
-            return str(obj)
-        elif isinstance(obj, bytes):
-            return obj.decode("utf-8")
-        elif isinstance(obj, np.float32):
-            return obj.item()
-        return super().default(obj)
+T = TypeVar("T")
 
 
 def batchify_iter(
@@ -58,29 +93,337 @@ def batchify_iter(
         yield batch
 
 
+def and_query(filter: dict, condition: dict) -> dict:
+    if not condition:
+        return filter
+    if not filter:
+        return condition
+    return {"$and": [filter, condition]}
+
+
+def id_range_query(
+    filter: dict,
+    last_id: Optional[Any] = None,
+    min_id: Optional[Any] = None,
+    max_id: Optional[Any] = None,
+) -> dict:
+    """Restrict `filter` to the `_id`s after `last_id`, or from `min_id`, up to `max_id`."""
+    bounds = {}
+    if last_id is not None:
+        bounds["$gt"] = last_id
+    elif min_id is not None:
+        bounds["$gte"] = min_id
+    if max_id is not None:
+        bounds["$lt"] = max_id
+    return and_query(filter, {"_id": bounds} if bounds else {})
+
+
+def id_type(value: Any) -> str:
+    """The BSON type bracket of an `_id`: MongoDB only compares `_id`s of the same one."""
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, (int, float, Decimal128)):
+        return "number"
+    if isinstance(value, bytes):
+        return "binary"
+    return type(value).__name__
+
+
+def mixed_id_types(collection: MongoCollection, filter: dict) -> bool:
+    """Whether the `_id`s matching `filter` are of several types, see `id_type`."""
+    first = collection.find_one(filter, {"_id": 1}, sort=[("_id", ASCENDING)])
+    if first is None:
+        return False
+    last = collection.find_one(filter, {"_id": 1}, sort=[("_id", DESCENDING)])
+    return id_type(first["_id"]) != id_type(last["_id"])
+
+
+def iter_id_batches(
+    collection: MongoCollection,
+    filter: dict,
+    batch_size: int | BatchSizer,
+    offset: int = 0,
+    limit: int = -1,
+    min_id: Optional[Any] = None,
+    max_id: Optional[Any] = None,
+    after_id: Optional[Any] = None,
+    projection: Optional[dict] = None,
+    hint: Optional[str | list] = None,
+) -> Iterator[list[dict]]:
+    """Iterate through a collection in `_id` order, one range query per batch."""
+    check_projection(projection)
+    sizer = as_sizer(batch_size)
+    last_id = after_id
+    remaining = limit
+    while remaining != 0:
+        size = sizer.next_size()
+        size = size if remaining == -1 else min(size, remaining)
+        query = id_range_query(filter, last_id, min_id, max_id)
+        batch = list(
+            collection.find(
+                filter=query,
+                projection=projection,
+                sort=[("_id", ASCENDING)],
+                skip=offset if last_id is None else 0,
+                limit=size,
+                batch_size=size,
+                hint=hint,
+            )
+        )
+        if not batch:
+            break
+        yield batch
+        last_id = batch[-1]["_id"]
+        if remaining != -1:
+            remaining -= len(batch)
+        if len(batch) < size:
+            break
+
+
+def iter_sorted_batches(
+    collection: MongoCollection,
+    filter: dict,
+    batch_size: int | BatchSizer,
+    sort: list,
+    offset: int = 0,
+    limit: int = -1,
+    projection: Optional[dict] = None,
+    hint: Optional[str | list] = None,
+) -> Iterator[list[dict]]:
+    """Iterate through a collection in `sort` order, from a single cursor."""
+    check_projection(projection)
+    if limit == 0:
+        return
+    sizer = as_sizer(batch_size)
+    size = sizer.next_size()
+    cursor = collection.find(
+        filter=filter,
+        projection=projection,
+        sort=sort,
+        skip=offset,
+        limit=max(limit, 0),
+        batch_size=size,
+        hint=hint,
+    )
+    batch = []
+    for document in cursor:
+        batch.append(document)
+        if len(batch) >= size:
+            yield batch
+            batch, size = [], sizer.next_size()
+    if batch:
+        yield batch
+
+
+def as_sizer(batch_size: int | BatchSizer) -> BatchSizer:
+    if isinstance(batch_size, BatchSizer):
+        return batch_size
+    return BatchSizer(batch_size, adaptive=False)
+
+
+def check_projection(projection: Optional[dict]):
+    # Batches are checkpointed, and paged through, by their last `_id`.
+    if projection is not None and not projection.get("_id", True):
+        raise ValueError("Projections must keep the `_id` field.")
+
+
+def count_documents(
+    collection: MongoCollection,
+    filter: dict,
+    hint: Optional[str | list] = None,
+) -> int:
+    """Number of documents matching `filter`, from the collection metadata when there is none."""
+    if not filter:
+        # count_documents({}) scans the whole collection.
+        return collection.estimated_document_count()
+    if hint is not None:
+        return collection.count_documents(filter, hint=hint)
+    return collection.count_documents(filter)
+
+
+def check_complete(
+    collection: MongoCollection,
+    filter: dict,
+    hint: Optional[str | list],
+    documents: int,
+    expected: int,
+    offset: int = 0,
+    limit: int = -1,
+):
+    """Raise a `RuntimeError` if fewer than the matching documents were backed up."""
+    if documents >= expected:
+        return
+    # The expected count may be an estimate, so count exactly before failing.
+    if hint is not None:
+        total = collection.count_documents(filter, hint=hint)
+    else:
+        total = collection.count_documents(filter)
+    total = max(total - offset, 0)
+    if limit != -1:
+        total = min(total, limit)
+    if documents < total:
+        raise RuntimeError(
+            f"Backed up {documents} of the {total} documents of "
+            f"'{collection.full_name}', the backup is incomplete."
+        )
+
+
+def split_id_ranges(
+    collection: MongoCollection,
+    partitions: int,
+    oversampling: int = 32,
+) -> list[tuple[Optional[Any], Optional[Any]]]:
+    """Split a collection into at most `partitions` `_id` ranges covering it."""
+    if partitions <= 1 or mixed_id_types(collection, {}):
+        return [(None, None)]
+    # A leading `$sample` reads random documents, where one after a `$match`
+    # would scan every match. Every partition applies the filter itself, so
+    # the ranges stay correct, but with a selective filter they split the
+    # matches less evenly.
+    pipeline = [
+        {"$sample": {"size": partitions * oversampling}},
+        {"$project": {"_id": 1}},
+        {"$sort": {"_id": ASCENDING}},
+    ]
+    ids = [doc["_id"] for doc in collection.aggregate(pipeline)]
+    if not ids:
+        return [(None, None)]
+
+    step = len(ids) / partitions
+    boundaries = []
+    for i in range(1, partitions):
+        boundary = ids[int(i * step)]
+        if not boundaries or boundary != boundaries[-1]:
+            boundaries.append(boundary)
+    return list(zip([None, *boundaries], [*boundaries, None]))
+
+
+def list_dumps(path: Path | str) -> list[tuple[str, Path]]:
+    """List the `(collection name, dump path)` pairs in a backup directory."""
+    path = Path(path)
+    dumps = []
+    parts = set()
+    for manifest in sorted(path.glob("*.manifest.json")):
+        with manifest.open() as f:
+            parts.update(part["file"] for part in json.load(f)["parts"])
+        dumps.append((manifest.name.removesuffix(".manifest.json"), manifest))
+    for state in path.glob("*.incremental.json"):
+        with state.open() as f:
+            parts.update(delta["file"] for delta in json.load(f)["deltas"])
+    files = {
+        file
+        for extension in EXTENSIONS.values()
+        for suffix in SUFFIXES.values()
+        for file in path.glob(f"*{extension}{suffix}")
+    }
+    for file in sorted(files):
+        if file.name not in parts:
+            dumps.append((dump_collection(file), file))
+    # Collections backed up without documents still get created, with their indexes.
+    names = set()
+    for name, dump in dumps:
+        if name in names:
+            files = ", ".join(file.name for other, file in dumps if other == name)
+            raise ValueError(
+                f"'{path}' holds several backups of '{name}': {files}. "
+                "Remove the stale ones."
+            )
+        names.add(name)
+    for metadata in sorted(path.glob("*.metadata.json")):
+        name = metadata.name.removesuffix(".metadata.json")
+        if name not in names:
+            dumps.append((name, metadata))
+    return dumps
+
+
+def dump_files(path: Path) -> list[Path]:
+    """Resolve a dump path, either a dump file or a manifest, to its dump files."""
+    if path.name.endswith(".metadata.json"):
+        return []
+    if not path.name.endswith(".manifest.json"):
+        return [path]
+    with path.open() as f:
+        manifest = json.load(f)
+    return [path.parent / part["file"] for part in manifest["parts"]]
+
+
+def iter_dump_batches(
+    path: Path,
+    offset: int = 0,
+    limit: int = -1,
+    start: int = 0,
+    sizer: Optional[BatchSizer] = None,
+) -> Iterator[tuple[list, int]]:
+    """Iterate through `(batch, end offset)` pairs of a dump from byte `start`."""
+    format = dump_format(path)
+    compression = detect_compression(path)
+    if compression != "none":
+        remaining = limit
+        blocks = iter_decompressed_blocks(path, compression, start=start, offset=offset)
+        for data, skip, end in blocks:
+            if remaining == 0:
+                return
+            records = split_records(data, format)[skip:]
+            if remaining != -1:
+                records = records[:remaining]
+                remaining -= len(records)
+            yield [decode_record(record, format) for record in records], end
+        return
+
+    with MappedDump(path, format) as dump:
+        end = start
+        if offset and start == 0:
+            # The record index turns the offset into a byte position directly.
+            end = dump.record_offset(offset)
+        elif offset:
+            records = dump.iter_records(start)
+            for _ in range(offset):
+                record = next(records, None)
+                if record is None:
+                    end = None
+                    break
+                end += len(record)
+        if end is None:
+            print("Offset is greater than the number of lines in the file.")
+            return
+
+        if limit == 0:
+            return
+        sizer = sizer or BatchSizer(BATCH_SIZE, adaptive=False)
+        for batch in iter_sized_batches(dump.iter_records(end), sizer, limit=limit):
+            end += sum(map(len, batch))
+            yield [decode_record(record, format) for record in batch], end
+
+
 def read_jsonl(
     path: Path,
     offset: int = 0,
     limit: int = -1,
 ) -> Iterable[list[dict]]:
-    with path.open("r") as f:
-        for _ in range(offset):
-            try:
-                next(f)
-            except StopIteration:
-                print("Offset is greater than the number of lines in the file.")
-                break
+    for batch, _ in iter_dump_batches(path, offset=offset, limit=limit):
+        yield batch
+
 
-        for batch in batchify_iter(f, BATCH_SIZE, limit=limit):
-            batch = [line.rstrip("\n") for line in batch]
-            yield list(map(json.loads, batch))
+def save_dump(
+    objs: Iterable,
+    path: Path,
+    collection_name: str,
+    format: str = "json",
+    compression: str = "none",
+) -> int:
+    """Append `objs` to the dump in `path` as one block; returns its new size."""
+    file = path / dump_name(collection_name, format, compression)
+    with DumpWriter(file, format=format, compression=compression) as writer:
+        return writer.write(list(objs))
 
 
-def save_jsonl(objs: Iterable, path: Path, collection_name: str):
-    path.mkdir(parents=True, exist_ok=True)
-    with open(f"{path}/{collection_name}.jsonl", "a") as f:
-        f.write("\n".join(json.dumps(o, cls=CustomJSONEncoder) for o in objs))
-        f.write("\n")
+def save_jsonl(
+    objs: Iterable,
+    path: Path,
+    collection_name: str,
+    compression: str = "none",
+) -> int:
+    return save_dump(objs, path, collection_name, compression=compression)
 
 
 def dump_jsonl(rows: Iterator[dict], file: Path):
@@ -89,12 +432,70 @@ def dump_jsonl(rows: Iterator[dict], file: Path):
             f.write(json.dumps(obj, cls=CustomJSONEncoder) + "\n")
 
 
-class BackupAndRestoreClient:
-    def __init__(self, db_uir: Optional[str] = None) -> None:
-        if db_uir is None:
-            db_uir = os.getenv("MONGODB_URI")
+def backup_state(bounds: tuple[Any, Any] = (None, None), offset: int = 0) -> dict:
+    """Initial checkpoint state of a backup of `bounds` into an empty dump."""
+    return {
+        "min_id": bounds[0],
+        "max_id": bounds[1],
+        "offset": offset,
+        "last_id": None,
+        "bytes": 0,
+        "documents": 0,
+        "complete": False,
+        "chunk": 0,
+        "chunks": [],
+    }
+
 
-        self.client = MongoClient(db_uir)
+def run_largest_first(
+    tasks: list[tuple[str, int, Callable[[], int]]],
+    jobs: int,
+) -> list[dict]:
+    """Run `(name, size, task)` tasks on `jobs` threads, largest first."""
+
+    def run(name: str, task: Callable[[], int]) -> dict:
+        start = time.perf_counter()
+        try:
+            documents, error = task(), None
+        except Exception as e:
+            documents, error = 0, e
+        return {
+            "collection": name,
+            "documents": documents,
+            "seconds": round(time.perf_counter() - start, 3),
+            "error": None if error is None else str(error),
+        }
+
+    tasks = sorted(tasks, key=lambda task: task[1], reverse=True)
+    with ThreadPoolExecutor(max_workers=max(jobs, 1)) as executor:
+        futures = [executor.submit(run, name, task) for name, _, task in tasks]
+        return report_summary([future.result() for future in futures])
+
+
+def report_summary(summary: list[dict]) -> list[dict]:
+    """Print a per-collection summary, and raise if any collection failed."""
+    print("Summary:")
+    for row in summary:
+        status = "ok" if row["error"] is None else f"failed: {row['error']}"
+        print(
+            f"  {row['collection']}: {row['documents']} documents "
+            f"in {row['seconds']}s ({status})"
+        )
+    failed = [row["collection"] for row in summary if row["error"] is not None]
+    if failed:
+        raise RuntimeError(f"Failed collections: {', '.join(failed)}.")
+    return summary
+
+
+class BackupAndRestoreClient:
+    def __init__(
+        self,
+        db_uir: Optional[str] = None,
+        hooks: Iterable[Callable[[dict], None]] = (),
+    ) -> None:
+        """`db_uir` is a URI or a configured cluster name."""
+        self.client = get_client(db_uir)
+        self.hooks = list(hooks)
 
     def backup_collection(
         self,
@@ -105,10 +506,30 @@ class BackupAndRestoreClient:
         offset: int = 0,
         limit: int = -1,
         filters: Optional[dict] = None,
-    ):
+        workers: int = 1,
+        resume: bool = False,
+        format: str = "json",
+        compression: str = "none",
+        index: bool = False,
+        projection: Optional[dict] = None,
+        sort: Optional[list] = None,
+        hint: Optional[str | list] = None,
+        chunk_size: int = 0,
+        on_chunk: Optional[Callable[[Path], None]] = None,
+    ) -> int:
+        """Back up the documents of `db.collection` matching `filters` to `path`."""
         if offset < 0:
             offset = 0
+        if workers > 1 and (offset != 0 or limit != -1):
+            raise ValueError(
+                "Offset and limit are not supported with multiple workers."
+            )
+        if workers > 1 and sort:
+            raise ValueError("Sort is not supported with multiple workers.")
+        check_projection(projection)
 
+        if is_remote(str(path)):
+            raise ValueError("Object storage is only supported for whole databases.")
         path = Path(path)
         collection = self.client[db][collection]
         if filters is None:
@@ -116,33 +537,366 @@ class BackupAndRestoreClient:
         else:
             filter = filters
 
-        num_docs = collection.count_documents(filter=filter)
+        if not sort and not dry_run and mixed_id_types(collection, filter):
+            # `_id` range queries only match one type, so read a single cursor.
+            print(f"'{collection.name}' has several `_id` types, reading one cursor.")
+            sort, workers = [("_id", ASCENDING)], 1
+
+        num_docs = count_documents(collection, filter, hint)
         collection_amount = num_docs
+        if not dry_run:
+            path.mkdir(parents=True, exist_ok=True)
+            if not resume:
+                # Whatever its layout, a previous backup would be restored too.
+                for stale in stale_dumps(path, collection.name):
+                    stale.unlink(missing_ok=True)
+            save_metadata(collection, path)
 
-        if not dry_run and num_docs > 0:
+        # The count may be an estimate, so even 0 does not skip the backup.
+        if not dry_run:
             print(f"Number of documents in collection: {collection_amount}.")
             if num_docs > BATCH_SIZE:
-                print(f"Downloading in mini-batches of {BATCH_SIZE} documents.")
-            total = 0
+                print(f"Downloading in batches of {BATCH_SIZE} documents at first.")
+            if workers > 1:
+                metrics = Metrics("backup", collection.name, num_docs, hooks=self.hooks)
+                total = self._backup_partitions(
+                    collection,
+                    filter,
+                    path,
+                    workers,
+                    resume=resume,
+                    format=format,
+                    compression=compression,
+                    index=index,
+                    metrics=metrics,
+                    projection=projection,
+                    hint=hint,
+                    chunk_size=chunk_size,
+                    on_chunk=on_chunk,
+                )
+                metrics.done()
+                check_complete(collection, filter, hint, total, num_docs)
+                print(f"Saved them to '{path}'.\n")
+                return total
+
+            num_docs = max(num_docs - offset, 0)
             if limit != -1 and limit < num_docs:
                 num_docs = limit
 
-            for i in range(0, num_docs, BATCH_SIZE):
-                if total + BATCH_SIZE > num_docs:
-                    l = num_docs - total
-                else:
-                    l = BATCH_SIZE
-                documents = collection.find(filter=filter, skip=i + offset, limit=l)
-                save_jsonl(documents, path, collection_name=collection.name)
-                total += BATCH_SIZE
-                if total > num_docs:
-                    total = num_docs
-                print(f"Downloaded {total}/{num_docs} documents.")
-                del documents
+            metrics = Metrics("backup", collection.name, num_docs, hooks=self.hooks)
+            state = self._backup_range(
+                collection,
+                filter,
+                path,
+                collection.name,
+                offset=offset,
+                # The count may be an estimate, so it must not cut the backup short.
+                limit=limit,
+                resume=resume,
+                num_docs=num_docs,
+                format=format,
+                compression=compression,
+                index=index,
+                metrics=metrics,
+                projection=projection,
+                sort=sort,
+                hint=hint,
+                chunk_size=chunk_size,
+                on_chunk=on_chunk,
+            )
+            if chunk_size:
+                save_collection_manifest(
+                    path, collection.name, format, compression, state["chunks"]
+                )
+            metrics.done()
+            check_complete(
+                collection, filter, hint, state["documents"], num_docs, offset, limit
+            )
             print(f"Saved them to '{path}'.\n")
+            return state["documents"]
 
         else:
             print(f"Number of documents in collection: {num_docs}.\n")
+            return 0
+
+    def backup_collection_incremental(
+        self,
+        db: str,
+        collection: str,
+        path: str,
+        dry_run: bool = False,
+        watermark_field: Optional[str] = None,
+        format: str = "extjson",
+        compression: str = "none",
+    ) -> int:
+        """Back up the changes to a collection since its last incremental backup."""
+        if format == "json":
+            raise ValueError(
+                "Incremental backups need a lossless format, use extjson or bson."
+            )
+        path = Path(path)
+        source = self.client[db][collection]
+        checkpoint = Checkpoint(path / collection, "incremental")
+        state = checkpoint.load()
+        if dry_run:
+            kind = "base snapshot" if state is None else "delta"
+            print(f"Will back up a {kind} of '{collection}' to '{path}'.\n")
+            return 0
+
+        if state is None:
+            base = path / dump_name(collection, format, compression)
+            if base.exists():
+                raise ValueError(f"'{base}' exists and is not an incremental backup.")
+            state = {
+                "base": base.name,
+                "watermark_field": watermark_field,
+                "deltas": [],
+            }
+            # The starting point is taken before the snapshot, so changes
+            # made while it runs end up in the first delta.
+            if watermark_field is None:
+                with source.watch() as stream:
+                    state["resume_token"] = stream.resume_token
+            else:
+                latest = source.find_one(
+                    {watermark_field: {"$exists": True}},
+                    sort=[(watermark_field, DESCENDING)],
+                )
+                state["watermark"] = None if latest is None else latest[watermark_field]
+            total = self.backup_collection(
+                db, collection, path, format=format, compression=compression
+            )
+            checkpoint.save(state)
+            return total
+
+        if state["watermark_field"] != watermark_field:
+            raise ValueError(
+                f"'{checkpoint.path}' tracks changes by "
+                f"{state['watermark_field'] or 'change stream'}, not "
+                f"{watermark_field or 'change stream'}."
+            )
+        if watermark_field is None:
+            changes = iter_stream_changes(source, state)
+        else:
+            changes = iter_watermark_changes(source, watermark_field, state, BATCH_SIZE)
+        delta_name = f"{collection}.delta-{len(state['deltas']) + 1:04d}"
+        delta = path / dump_name(delta_name, "extjson", compression)
+        delta.unlink(missing_ok=True)  # left over by an interrupted run
+        total = 0
+        with DumpWriter(delta, format="extjson", compression=compression) as writer:
+            for records in batchify_iter(changes, BATCH_SIZE):
+                writer.write(records)
+                total += len(records)
+        state["deltas"].append({"file": delta.name, "changes": total})
+        checkpoint.save(state)
+        print(f"Saved {total} changes to '{delta}'.\n")
+        return total
+
+    def _backup_range(
+        self,
+        collection: MongoCollection,
+        filter: dict,
+        path: Path,
+        name: str,
+        offset: int = 0,
+        limit: int = -1,
+        bounds: tuple[Any, Any] = (None, None),
+        resume: bool = False,
+        num_docs: Optional[int] = None,
+        format: str = "json",
+        compression: str = "none",
+        index: bool = False,
+        metrics: Optional[Metrics] = None,
+        projection: Optional[dict] = None,
+        sort: Optional[list] = None,
+        hint: Optional[str | list] = None,
+        chunk_size: int = 0,
+        on_chunk: Optional[Callable[[Path], None]] = None,
+    ) -> dict:
+        """Back up one `_id` range to the `name` dump; returns the final state."""
+        if metrics is None:
+            metrics = Metrics("backup", name, hooks=self.hooks)
+        file = path / dump_name(name, format, compression)
+        checkpoint = Checkpoint(file)
+
+        def chunk_file() -> Path:
+            if not chunk_size:
+                return file
+            return path / dump_name(
+                chunk_name(name, state["chunk"]), format, compression
+            )
+
+        def finish_chunk() -> Optional[Path]:
+            documents = state["documents"] - sum(
+                c["documents"] for c in state["chunks"]
+            )
+            if documents > 0:
+                entry = chunk_entry(chunk_file(), documents, format, compression)
+                state["chunks"].append(entry)
+                return chunk_file()
+
+        state = checkpoint.load() if resume else None
+        if state is not None and "chunks" not in state:  # saved before chunks
+            state = {**state, "chunk": 0, "chunks": []}
+            if state["complete"]:
+                finish_chunk()
+        if state is None:
+            # A fresh backup replaces the files of a previous one.
+            path.mkdir(parents=True, exist_ok=True)
+            for stale in stale_dumps(path, name):
+                stale.unlink(missing_ok=True)
+            state = backup_state(bounds, offset=offset)
+            checkpoint.save(state)
+        elif state["complete"]:
+            print(f"'{file}' is already complete.")
+            return state
+        else:
+            if chunk_file().exists():
+                os.truncate(chunk_file(), state["bytes"])
+            if state["documents"]:
+                print(f"Resuming '{file}' after {state['documents']} documents.")
+
+        if format == "bson":
+            # Documents are written as they come off the wire, without decoding.
+            collection = collection.with_options(
+                codec_options=CodecOptions(document_class=RawBSONDocument)
+            )
+        # Batches grow while they are quick to fetch and write, and shrink to
+        # keep large documents under MAX_BATCH_BYTES, or within a chunk.
+        sizer = BatchSizer(BATCH_SIZE)
+        if chunk_size:
+            sizer.max_bytes = min(sizer.max_bytes, chunk_size)
+        if sort:
+            batches = iter_sorted_batches(
+                collection,
+                filter,
+                sizer,
+                sort,
+                offset=state["offset"] + state["documents"],
+                limit=-1 if limit == -1 else limit - state["documents"],
+                projection=projection,
+                hint=hint,
+            )
+        else:
+            batches = iter_id_batches(
+                collection,
+                filter,
+                sizer,
+                offset=state["offset"],
+                limit=-1 if limit == -1 else limit - state["documents"],
+                min_id=state["min_id"],
+                max_id=state["max_id"],
+                after_id=state["last_id"],
+                projection=projection,
+                hint=hint,
+            )
+        writer = None
+        try:
+            batch_start = time.perf_counter()
+            for documents in metrics.timed(batches, "fetch"):
+                if chunk_size and state["bytes"] >= chunk_size:
+                    if writer is not None:
+                        writer.close()
+                        writer = None
+                    finished = finish_chunk()
+                    state["chunk"] += 1
+                    state["bytes"] = 0
+                    checkpoint.save(state)
+                    if finished is not None and on_chunk is not None:
+                        on_chunk(finished)
+                if writer is None:
+                    writer = DumpWriter(
+                        chunk_file(),
+                        format=format,
+                        compression=compression,
+                        index=index,
+                    )
+                size, encoded = state["bytes"], writer.encoded_bytes
+                state["bytes"] = writer.write(documents, metrics)
+                state["documents"] += len(documents)
+                state["last_id"] = documents[-1]["_id"]
+                checkpoint.save(state)
+                now = time.perf_counter()
+                metrics.batch(len(documents), state["bytes"] - size, now - batch_start)
+                sizer.observe(
+                    len(documents), writer.encoded_bytes - encoded, now - batch_start
+                )
+                batch_start = now
+                if num_docs is not None:
+                    print(f"Downloaded {state['documents']}/{num_docs} documents.")
+                del documents
+        finally:
+            if writer is not None:
+                writer.close()
+        finished = finish_chunk()
+        state["complete"] = True
+        checkpoint.save(state)
+        if finished is not None and on_chunk is not None:
+            on_chunk(finished)
+        return state
+
+    def _backup_partitions(
+        self,
+        collection: MongoCollection,
+        filter: dict,
+        path: Path,
+        workers: int,
+        resume: bool = False,
+        format: str = "json",
+        compression: str = "none",
+        index: bool = False,
+        metrics: Optional[Metrics] = None,
+        projection: Optional[dict] = None,
+        hint: Optional[str | list] = None,
+        chunk_size: int = 0,
+        on_chunk: Optional[Callable[[Path], None]] = None,
+    ) -> int:
+        parts_name = f"{glob.escape(collection.name)}.part-*"
+        pattern = dump_name(parts_name, format, compression)
+        checkpoints = sorted(path.glob(f"{pattern}.checkpoint.json"))
+        if resume and checkpoints:
+            print(f"Resuming {len(checkpoints)} partitions.")
+        else:
+            for extension in EXTENSIONS.values():
+                for stale in path.glob(f"{parts_name}{extension}*"):
+                    stale.unlink(missing_ok=True)
+            ranges = split_id_ranges(collection, workers)
+            print(f"Downloading {len(ranges)} partitions with {workers} workers.")
+            path.mkdir(parents=True, exist_ok=True)
+            for part, bounds in enumerate(ranges):
+                part_name = f"{collection.name}.part-{part:04d}"
+                part_file = path / dump_name(part_name, format, compression)
+                Checkpoint(part_file).save(backup_state(bounds))
+            checkpoints = sorted(path.glob(f"{pattern}.checkpoint.json"))
+
+        def backup_partition(checkpoint: Path) -> list[dict]:
+            part_file = checkpoint.name.removesuffix(".checkpoint.json")
+            state = self._backup_range(
+                collection,
+                filter,
+                path,
+                dump_collection(Path(part_file)),
+                resume=True,
+                format=format,
+                compression=compression,
+                index=index,
+                metrics=metrics,
+                projection=projection,
+                hint=hint,
+                chunk_size=chunk_size,
+                on_chunk=on_chunk,
+            )
+            print(f"Downloaded {state['documents']} documents to '{part_file}'.")
+            return state["chunks"]
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            parts = list(executor.map(backup_partition, checkpoints))
+
+        chunks = [chunk for part in parts for chunk in part]
+        manifest = save_collection_manifest(
+            path, collection.name, format, compression, chunks
+        )
+        return manifest["documents"]
 
     def restore_collection(
         self,
@@ -152,26 +906,183 @@ class BackupAndRestoreClient:
         dry_run: bool = False,
         offset: int = 0,
         limit: int = -1,
-    ):
+        workers: int = 1,
+        write_concern: Optional[int | str] = None,
+        journal: Optional[bool] = None,
+        bypass_document_validation: bool = False,
+        resume: bool = False,
+        processes: int = 0,
+        indexes: bool = True,
+        index_workers: int = 1,
+    ) -> int:
+        """Restore a dump into `db.collection`, with `workers` inserts in flight."""
+        if is_remote(str(path)):
+            raise ValueError("Object storage is only supported for whole databases.")
         path = Path(path)
         collection = self.client[db][collection]
+        if write_concern is not None or journal is not None:
+            collection = collection.with_options(
+                write_concern=WriteConcern(w=write_concern, j=journal)
+            )
         print(
-            f"Restoring in mini-batches of {BATCH_SIZE} documents. This may take a while."
+            f"Restoring in batches of {BATCH_SIZE} documents at first. This may take a while."
         )
+        files = dump_files(path)
+        if len(files) > 1 and (offset != 0 or limit != -1):
+            raise ValueError(
+                "Offset and limit are not supported for partitioned dumps."
+            )
         if not dry_run:
+            metadata = load_metadata(path)
+            if metadata is not None:
+                if create_collection(collection.database, collection.name, metadata):
+                    print(f"Created '{collection.full_name}' from its metadata.")
+                if metadata["type"] == "view":
+                    return 0
             total = 0
-            for document_batch in read_jsonl(path, offset=offset, limit=limit):
-                print(f"Read {len(document_batch)} documents.")
+            lock = threading.Lock()
+            total_bytes = sum(file.stat().st_size for file in files)
+            metrics = Metrics(
+                "restore", collection.name, total_bytes=total_bytes, hooks=self.hooks
+            )
+
+            def insert(batch: tuple) -> int:
+                nonlocal total
+                document_batch, size, progress, seq, state = batch
+                start = time.perf_counter()
+                try:
+                    result = collection.insert_many(
+                        document_batch,
+                        ordered=False,
+                        bypass_document_validation=bypass_document_validation,
+                    )
+                    inserted = len(result.inserted_ids)
+                except BulkWriteError as e:
+                    errors = e.details["writeErrors"]
+                    if not resume or any(err["code"] != 11000 for err in errors):
+                        raise
+                    inserted = e.details["nInserted"]
+                latency = time.perf_counter() - start
+                metrics.add_time("insert", latency)
+                metrics.batch(inserted, size, latency)
+                sizer.observe(len(document_batch), size, latency)
+                progress.done(seq, state)
+                with lock:
+                    total += inserted
+                    print(f"Restored {total} documents so far.")
+                return inserted
 
-                result = collection.insert_many(document_batch)
-                total += len(result.inserted_ids)
-                print(f"Restored {total} documents so far.")
-                del result
+            # Uncompressed dumps are read in batches sized by how fast the
+            # server takes them in; compressed ones keep their blocks.
+            sizer = BatchSizer(BATCH_SIZE)
+            read_dump = partial(iter_dump_batches, sizer=sizer)
+            if processes > 0:
+                read_dump = partial(
+                    iter_decoded_batches, processes=processes, batch_size=BATCH_SIZE
+                )
+
+            def read_batches() -> Iterator[tuple]:
+                for file in files:
+                    checkpoint = Checkpoint(file, "restore-checkpoint")
+                    state = checkpoint.load() if resume else None
+                    if state is None:
+                        state = {
+                            "target": collection.full_name,
+                            "bytes": 0,
+                            "lines": 0,
+                            "complete": False,
+                        }
+                        skip = offset
+                    elif state["target"] != collection.full_name:
+                        raise ValueError(
+                            f"'{checkpoint.path}' belongs to a restore "
+                            f"into '{state['target']}'."
+                        )
+                    elif state["complete"]:
+                        print(f"'{file}' is already restored.")
+                        continue
+                    else:
+                        skip = 0
+                        print(f"Resuming '{file}' after {state['lines']} lines.")
+
+                    progress = OrderedProgress(checkpoint.save)
+                    batches = read_dump(
+                        file,
+                        offset=skip,
+                        limit=-1 if limit == -1 else max(limit - state["lines"], 0),
+                        start=state["bytes"],
+                    )
+                    seq = -1
+                    batches = metrics.timed(batches, "read")
+                    for seq, (document_batch, end) in enumerate(batches):
+                        print(f"Read {len(document_batch)} documents.")
+                        size = end - state["bytes"]
+                        state = {
+                            **state,
+                            "bytes": end,
+                            "lines": state["lines"] + len(document_batch),
+                        }
+                        yield document_batch, size, progress, seq, state
+                    progress.done(seq + 1, {**state, "complete": True})
+
+            total = run_pipeline(read_batches(), insert, workers=workers)
+            metrics.done()
+            if metadata is not None and indexes:
+                with metrics.timer("index"):
+                    build_indexes(collection, metadata["indexes"], index_workers)
+            return total
 
         else:
             print(f" Will Restore documents from '{path}'.")
+            return 0
+
+    def restore_collection_incremental(
+        self,
+        db: str,
+        collection: str,
+        path: str,
+        dry_run: bool = False,
+        workers: int = 1,
+    ) -> int:
+        """
+        Restore the base snapshot of an incremental backup, then replay its deltas in order.
+        """
+        path = Path(path)
+        state = Checkpoint(path / collection, "incremental").load()
+        if state is None:
+            raise ValueError(f"No incremental backup of '{collection}' in '{path}'.")
+        total = self.restore_collection(
+            db, collection, path / state["base"], dry_run=dry_run, workers=workers
+        )
+        if dry_run:
+            print(f" Will replay {len(state['deltas'])} deltas.")
+            return total
 
-    def backup_db(self, db: str, path: str, dry_run: bool = False):
+        target = self.client[db][collection]
+        for delta in state["deltas"]:
+            for records in read_jsonl(path / delta["file"]):
+                # Ordered, so several changes to one document apply in sequence.
+                target.bulk_write([record_operation(r) for r in records])
+            print(f"Replayed {delta['changes']} changes from '{delta['file']}'.")
+        return total
+
+    def backup_db(
+        self,
+        db: str,
+        path: str,
+        dry_run: bool = False,
+        jobs: int = 1,
+        resume: bool = False,
+        format: Optional[str] = None,
+        compression: str = "none",
+        incremental: bool = False,
+        watermark_field: Optional[str] = None,
+        index: bool = False,
+        chunk_size: int = 0,
+    ) -> list[dict]:
+        """Back up every collection of `db`, up to `jobs` at a time, largest first."""
+        if format is None:
+            format = "extjson" if incremental else "json"
         if path.endswith("/"):
             path = f"{path}{db}"
         else:
@@ -180,55 +1091,284 @@ class BackupAndRestoreClient:
             print(f"Backing up database '{db}' to '{path}'.\n")
         else:
             print(f"Will back up database '{db}' to '{path}'.\n")
-        for collection in self.client[db].list_collection_names():
+
+        local, storage, uploader = path, None, None
+        if is_remote(path):
+            if incremental:
+                raise ValueError("Incremental backups can only be saved locally.")
+            storage = open_storage(path)
+            local = str(staging_dir(path))
+            chunk_size = chunk_size or REMOTE_CHUNK_SIZE
+            # Every backup job can have a chunk waiting for its upload.
+            uploader = Uploader(storage, pending=max(jobs, 1) + 1)
+
+        def backup(collection: str) -> int:
             print(f"Backing up collection '{collection}' to '{path}'.")
-            self.backup_collection(db, collection, path, dry_run=dry_run)
+            if incremental:
+                return self.backup_collection_incremental(
+                    db,
+                    collection,
+                    path,
+                    dry_run=dry_run,
+                    watermark_field=watermark_field,
+                    format=format,
+                    compression=compression,
+                )
+            return self.backup_collection(
+                db,
+                collection,
+                local,
+                dry_run=dry_run,
+                resume=resume,
+                format=format,
+                compression=compression,
+                index=index,
+                chunk_size=chunk_size,
+                on_chunk=uploader and uploader.submit,
+            )
+
+        collections = self.client[db].list_collection_names()
+        tasks = [
+            (
+                collection,
+                self.collection_size(db, collection),
+                partial(backup, collection),
+            )
+            for collection in collections
+        ]
+        try:
+            summary = run_largest_first(tasks, jobs)
+        except BaseException as error:
+            # Uploads still finish, but the failed collections are the error.
+            if uploader is not None:
+                try:
+                    uploader.wait()
+                except Exception as upload_error:
+                    raise error from upload_error
+            raise
+        if uploader is not None:
+            uploader.wait()
+        if not dry_run and not incremental:
+            dumps = [dump for dump in list_dumps(local) if dump[0] in collections]
+            manifest = save_db_manifest(Path(local), db, dumps)
+            if storage is not None:
+                upload_backup(storage, Path(local), manifest)
+                shutil.rmtree(local)
+            print(f"Saved the manifest of '{path}'.")
+        return summary
+
+    def collection_size(self, db: str, collection: str) -> int:
+        try:
+            return self.client[db].command("collStats", collection)["size"]
+        except OperationFailure:  # views have no stats
+            return 0
 
-    def restore_db(self, db: str, path: str, dry_run: bool = False):
+    def restore_db(
+        self,
+        db: str,
+        path: str,
+        dry_run: bool = False,
+        jobs: int = 1,
+        workers: int = 1,
+        resume: bool = False,
+        processes: int = 0,
+        indexes: bool = True,
+        index_workers: int = 1,
+        verify: bool = True,
+    ) -> list[dict]:
+        """Restore every collection dumped under `path/db`, up to `jobs` at a time."""
         if not path.endswith("/"):
             path = f"{path}/{db}/"
         else:
             path = f"{path}{db}/"
 
-        collections = glob.glob(f"{path}/*.jsonl")
+        storage = None
+        if is_remote(path):
+            if dry_run:
+                print(f"Will restore '{path}' to database '{db}'.\n")
+                return []
+            storage = open_storage(path)
+            local = staging_dir(path)
+            print(f"Restoring '{path}' to database '{db}' through '{local}'.\n")
+            summary = self._restore_manifest(
+                db,
+                local,
+                download_backup(storage, local),
+                jobs=jobs,
+                workers=workers,
+                resume=resume,
+                processes=processes,
+                indexes=indexes,
+                index_workers=index_workers,
+                verify=verify,
+                storage=storage,
+            )
+            shutil.rmtree(local)
+            return summary
+
+        manifest = None if dry_run else load_db_manifest(Path(path))
+        if manifest is not None:
+            print(f"Restoring '{path}' to database '{db}' from its manifest.\n")
+            return self._restore_manifest(
+                db,
+                Path(path),
+                manifest,
+                jobs=jobs,
+                workers=workers,
+                resume=resume,
+                processes=processes,
+                indexes=indexes,
+                index_workers=index_workers,
+                verify=verify,
+            )
+
+        collections = list_dumps(path)
         if not dry_run:
             print(f"Restoring '{path}' to database '{db}'.\n")
         else:
             print(f"Will restore '{path}' to database '{db}'.\n")
-        for collection in collections:
-            collection_name = Path(collection).stem
+
+        def restore(collection_name: str, collection: Path) -> int:
             print(f"Restoring collection '{collection}' to '{path}'.")
-            self.restore_collection(
-                db=db, collection=collection_name, path=collection, dry_run=dry_run
+            if (Path(path) / f"{collection_name}.incremental.json").exists():
+                return self.restore_collection_incremental(
+                    db, collection_name, path, dry_run=dry_run, workers=workers
+                )
+            return self.restore_collection(
+                db=db,
+                collection=collection_name,
+                path=collection,
+                dry_run=dry_run,
+                workers=workers,
+                resume=resume,
+                processes=processes,
+                indexes=indexes,
+                index_workers=index_workers,
+            )
+
+        tasks = [
+            (
+                collection_name,
+                sum(file.stat().st_size for file in dump_files(collection)),
+                partial(restore, collection_name, collection),
             )
+            for collection_name, collection in collections
+        ]
+        return run_largest_first(tasks, jobs)
+
+    def _restore_manifest(
+        self,
+        db: str,
+        path: Path,
+        manifest: dict,
+        jobs: int = 1,
+        workers: int = 1,
+        resume: bool = False,
+        processes: int = 0,
+        indexes: bool = True,
+        index_workers: int = 1,
+        verify: bool = True,
+        storage: Optional[Storage] = None,
+    ) -> list[dict]:
+        """Restore the chunks listed by a database manifest, up to `jobs` at a time."""
+        database = self.client[db]
+        tasks = []
+        loaded = []
+
+        def restore_chunk(name: str, chunk: dict) -> int:
+            file = path / chunk["file"]
+            state = Checkpoint(file, "restore-checkpoint").load() if resume else None
+            if state is not None and state["complete"]:
+                print(f"'{file}' is already restored.")
+                return 0
+            if storage is not None:
+                storage.download(chunk["file"], file)
+            if verify:
+                verify_chunk(path, chunk)
+            restored = self.restore_collection(
+                db=db,
+                collection=name,
+                path=file,
+                workers=workers,
+                resume=resume,
+                processes=processes,
+                indexes=False,
+            )
+            if storage is not None:
+                file.unlink()
+            return restored
+
+        for entry in manifest["collections"]:
+            name = entry["collection"]
+            if (path / f"{name}.incremental.json").exists():
+                restore = partial(
+                    self.restore_collection_incremental, db, name, path, workers=workers
+                )
+                tasks.append((name, entry["bytes"], restore))
+                continue
+            metadata = entry["metadata"] and load_metadata(path / entry["metadata"])
+            if metadata:
+                if create_collection(database, name, metadata):
+                    print(f"Created '{database.name}.{name}' from its metadata.")
+                if metadata["type"] == "view":
+                    continue
+                loaded.append((name, metadata))
+            for chunk in entry["chunks"]:
+                restore = partial(restore_chunk, name, chunk)
+                tasks.append((chunk["file"], chunk["bytes"], restore))
+
+        summary = run_largest_first(tasks, jobs)
+        if indexes:
+            for name, metadata in loaded:
+                build_indexes(database[name], metadata["indexes"], index_workers)
+        return summary
 
     def backup_milvus_collection(
+        self,
         collection_name: str,
         path: str,
         limit: int = -1,
         dry_run: bool = False,
-    ):
+        expr: str = "",
+    ) -> int:
+        """Back up a Milvus collection, or the rows matching `expr`, to `path`."""
+        from . import milvus  # pymilvus is slow to import, and only needed here
+
         path = Path(path)
-        connections.connect(
-            alias="default",
-            uri=os.environ["MILVUS_HOST"],
-            password=os.getenv("MILVUS_PASSWORD", ""),
-            token=os.getenv("MILVUS_TOKEN", ""),
-            user=os.getenv("MILVUS_USER", ""),
+        milvus.connect_milvus()
+        metadata = path / f"{collection_name}.milvus.json"
+        if dry_run:
+            print(f"Will back up {collection_name} to {path}.")
+            return 0
+        if metadata.exists():
+            print(f"File {metadata} already exists. Skipping.")
+            return 0
+        print(f"Backing up {collection_name} to {path}")
+        total = milvus.backup_milvus_collection(
+            collection_name, path, expr=expr, limit=limit, batch_size=BATCH_SIZE
         )
-        collection = Collection(collection_name)
-        if not dry_run:
-            file = (dir / collection_name).with_suffix(".jsonl")
-            if file.exists():
-                print(f"File {dir / collection_name} already exists. Skipping.")
-                return
-            print(f"Backing up {collection_name} to {file}")
-            rows = collection.query(
-                "kb_name == 'sf_help'",
-                limit=limit,
-                output_fields=["kb_name", "pk", "vector"],
-            )
-            dump_jsonl(rows, file)
-            print(f"Downloaded {len(rows)} documents.")
-        else:
-            print(f"Will back up {collection_name} to {dir / collection_name}.")
+        print(f"Downloaded {total} documents.")
+        return total
+
+    def restore_milvus_collection(
+        self,
+        collection_name: str,
+        path: str,
+        dry_run: bool = False,
+        dump_name: Optional[str] = None,
+    ) -> int:
+        """
+        Restore a Milvus backup of `dump_name` (by default `collection_name`) from `path`.
+        """
+        from . import milvus
+
+        path = Path(path)
+        milvus.connect_milvus()
+        if dry_run:
+            print(f"Will restore {dump_name or collection_name} to {collection_name}.")
+            return 0
+        total = milvus.restore_milvus_collection(
+            collection_name, path, dump_name=dump_name, batch_size=BATCH_SIZE
+        )
+        print(f"Restored {total} documents.")
+        return total
@@ -0,0 +1,176 @@
+import struct
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator, Optional
+
+# A compressed dump is a sequence of independently compressed blocks, one per
+# backup batch. Every block starts with a small header holding its size and
+# record count, so blocks can be skipped, split between workers and truncated
+# without inflating anything. The headers are standard extensions of each
+# format, so `zcat` and `zstdcat` still read the whole dump.
+#
+# gzip: one member per block, with a FEXTRA subfield "AX" holding
+#   (block size, records), like BGZF does for BAM files.
+# zstd: one skippable frame holding (block size, records), then one zstd frame.
+GZIP_HEADER = struct.Struct("<2sBBIBBH")
+GZIP_EXTRA = struct.Struct("<2sHII")
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_HEADER = struct.Struct("<IIII")
+ZSTD_SKIPPABLE_MAGIC = 0x184D2A50
+SUFFIXES = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+
+
+class Compression(str, Enum):
+    none = "none"
+    gzip = "gzip"
+    zstd = "zstd"
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ImportError(
+            "zstd compression requires the zstandard package: "
+            "pip install axolotl-dbu[zstd]"
+        ) from e
+    return zstandard
+
+
+def compress_chunks(
+    chunks: Iterable[bytes],
+    records: int,
+    compression: str,
+) -> Iterable[bytes]:
+    """
+    Compress `chunks`, holding `records` records, into one self-describing block.
+
+    The block is returned as pieces to be written in order, so the
+    uncompressed data never has to be joined into a single string.
+    """
+    if compression == "gzip":
+        compressor = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+        crc, length, pieces = 0, 0, []
+        for chunk in chunks:
+            crc = zlib.crc32(chunk, crc)
+            length += len(chunk)
+            pieces.append(compressor.compress(chunk))
+        pieces.append(compressor.flush())
+        size = GZIP_HEADER.size + GZIP_EXTRA.size + sum(map(len, pieces)) + 8
+        return [
+            GZIP_HEADER.pack(GZIP_MAGIC, 8, 4, 0, 0, 255, GZIP_EXTRA.size),
+            GZIP_EXTRA.pack(b"AX", 8, size, records),
+            *pieces,
+            struct.pack("<II", crc, length & 0xFFFFFFFF),
+        ]
+    if compression == "zstd":
+        compressor = _zstandard().ZstdCompressor().compressobj()
+        pieces = [compressor.compress(chunk) for chunk in chunks]
+        pieces.append(compressor.flush())
+        size = ZSTD_HEADER.size + sum(map(len, pieces))
+        return [ZSTD_HEADER.pack(ZSTD_SKIPPABLE_MAGIC, 8, size, records), *pieces]
+    return chunks
+
+
+def compress_block(data: bytes, records: int, compression: str) -> bytes:
+    """Compress `data`, holding `records` records, into one self-describing block."""
+    return b"".join(compress_chunks([data], records, compression))
+
+
+def decompress_block(block: bytes, compression: str) -> bytes:
+    if compression == "gzip":
+        return zlib.decompress(block, 16 + zlib.MAX_WBITS)
+    if compression == "zstd":
+        decompressor = _zstandard().ZstdDecompressor().decompressobj()
+        return decompressor.decompress(block[ZSTD_HEADER.size :])
+    return block
+
+
+def detect_compression(path: Path) -> str:
+    """Detect the compression of a dump from its first bytes."""
+    with path.open("rb") as f:
+        magic = f.read(4)
+    if magic.startswith(GZIP_MAGIC):
+        return "gzip"
+    if len(magic) == 4 and struct.unpack("<I", magic)[0] == ZSTD_SKIPPABLE_MAGIC:
+        return "zstd"
+    return "none"
+
+
+def read_block_header(f: BinaryIO, compression: str) -> Optional[tuple[int, int]]:
+    """Read the `(size, records)` header of the block at the current position."""
+    header_size = GZIP_HEADER.size + GZIP_EXTRA.size
+    if compression == "zstd":
+        header_size = ZSTD_HEADER.size
+    header = f.read(header_size)
+    if not header:
+        return None
+    if len(header) < header_size:
+        raise ValueError(f"'{f.name}' ends with a truncated block.")
+    if compression == "gzip":
+        magic, _, flags, _, _, _, _ = GZIP_HEADER.unpack_from(header)
+        subfield, _, size, records = GZIP_EXTRA.unpack_from(header, GZIP_HEADER.size)
+        if magic != GZIP_MAGIC or not flags & 4 or subfield != b"AX":
+            raise ValueError(f"'{f.name}' is not a block-framed gzip dump.")
+        return size, records
+    magic, _, size, records = ZSTD_HEADER.unpack(header)
+    if magic != ZSTD_SKIPPABLE_MAGIC:
+        raise ValueError(f"'{f.name}' is not a block-framed zstd dump.")
+    return size, records
+
+
+def iter_blocks(
+    f: BinaryIO,
+    compression: str,
+    start: int = 0,
+) -> Iterator[tuple[int, int, int]]:
+    """Iterate through the `(position, size, records)` of the blocks of a dump."""
+    position = start
+    while True:
+        f.seek(position)
+        header = read_block_header(f, compression)
+        if header is None:
+            return
+        size, records = header
+        yield position, size, records
+        position += size
+
+
+def iter_decompressed_blocks(
+    path: Path,
+    compression: str,
+    start: int = 0,
+    offset: int = 0,
+    workers: int = 4,
+) -> Iterator[tuple[bytes, int, int]]:
+    """
+    Iterate through the `(data, skip, end)` of every block of a compressed dump.
+
+    Reading starts at byte `start`, then skips `offset` records, using block
+    headers to skip whole blocks without inflating them; `skip` is the number
+    of records still to be skipped at the start of `data`. Up to `workers`
+    blocks are decompressed at once by a thread pool, ahead of the consumer.
+    `end` is the byte offset right after the block.
+    """
+    with path.open("rb") as f, ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for position, size, records in iter_blocks(f, compression, start):
+            if offset >= records:
+                offset -= records
+                continue
+            f.seek(position)
+            block = f.read(size)
+            if len(block) < size:
+                raise ValueError(f"'{path}' ends with a truncated block.")
+            future = executor.submit(decompress_block, block, compression)
+            pending.append((future, offset, position + size))
+            offset = 0
+            if len(pending) > workers:
+                future, skip, end = pending.popleft()
+                yield future.result(), skip, end
+        while pending:
+            future, skip, end = pending.popleft()
+            yield future.result(), skip, end
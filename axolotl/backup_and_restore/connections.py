@@ -0,0 +1,93 @@
+import os
+import threading
+from functools import cache
+from typing import Any, Optional
+
+from pymongo import MongoClient
+
+# MongoClients are expensive to create (DNS SRV lookups, TLS handshakes, a
+# monitoring thread per server) and are meant to be shared, so every client
+# of the process comes from this registry, one per cluster and options.
+#
+# A cluster is a name from the clusters config file, a URI, a host string
+# like "localhost:27017", or None for MONGODB_URI. The config file maps names
+# to a URI, or to a mapping with a `uri` and MongoClient options for that
+# cluster:
+#
+#   local: mongodb://localhost:27017
+#   beta:
+#     uri: mongodb+srv://<user>:<password>@some-cluster.mongodb.net/
+#     maxPoolSize: 50
+#     compressors: zstd,snappy
+#
+# Options left out come from MONGODB_MAX_POOL_SIZE and MONGODB_COMPRESSORS.
+CLUSTERS_FILE = "~/.config/axolotl-clusters.yml"
+_clients: dict[tuple, MongoClient] = {}
+_lock = threading.Lock()
+
+
+@cache
+def read_clusters() -> dict[str, Any]:
+    """Read the clusters config file, once per process."""
+    import yaml
+
+    with open(os.path.expanduser(CLUSTERS_FILE), "r") as file_object:
+        return yaml.load(file_object, Loader=yaml.SafeLoader) or {}
+
+
+def pool_options() -> dict[str, Any]:
+    """Default MongoClient options, from the environment."""
+    options = {}
+    if max_pool_size := os.getenv("MONGODB_MAX_POOL_SIZE"):
+        options["maxPoolSize"] = int(max_pool_size)
+    if compressors := os.getenv("MONGODB_COMPRESSORS"):
+        options["compressors"] = compressors
+    return options
+
+
+def is_host(cluster: str) -> bool:
+    """Whether a cluster that is not in the config file is a host string."""
+    return cluster == "localhost" or any(char in cluster for char in ":.,")
+
+
+def resolve_cluster(cluster: Optional[str] = None) -> tuple[str, dict[str, Any]]:
+    """URI and MongoClient options of a cluster name, a URI, or MONGODB_URI."""
+    if cluster is None:
+        return os.getenv("MONGODB_URI"), pool_options()
+    if "://" in cluster:
+        return cluster, pool_options()
+    try:
+        config = read_clusters()[cluster]
+    except (FileNotFoundError, KeyError):
+        # "host:port", "host1,host2", ... go to MongoClient as they are.
+        if is_host(cluster):
+            return cluster, pool_options()
+        raise KeyError(f"Cluster '{cluster}' not found in {CLUSTERS_FILE}.") from None
+    if isinstance(config, str):
+        return config, pool_options()
+    options = {key: value for key, value in config.items() if key != "uri"}
+    return config["uri"], {**pool_options(), **options}
+
+
+def get_client(cluster: Optional[str] = None, **options) -> MongoClient:
+    """
+    The process-wide MongoClient of a cluster, created on first use.
+
+    `options` override the cluster's MongoClient options; each distinct set
+    of options gets its own client.
+    """
+    uri, cluster_options = resolve_cluster(cluster)
+    options = {**cluster_options, **options}
+    key = (uri, tuple(sorted((name, str(value)) for name, value in options.items())))
+    with _lock:
+        if key not in _clients:
+            _clients[key] = MongoClient(uri, **options)
+        return _clients[key]
+
+
+def close_clients():
+    """Close every client of the registry, e.g. before forking."""
+    with _lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
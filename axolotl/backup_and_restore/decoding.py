@@ -0,0 +1,150 @@
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterator
+
+import bson
+from bson.objectid import ObjectId
+from bson.raw_bson import RawBSONDocument
+
+from .compression import decompress_block, detect_compression, iter_blocks
+from .formats import decode_record, dump_format, split_records
+from .index import MappedDump
+
+# Restores can decode dumps in worker processes, one chunk at a time: a run
+# of index strides of an uncompressed dump, or one block of a compressed one.
+# Workers send documents back as BSON, which is cheap to pickle, and the main
+# process inserts them as RawBSONDocuments without decoding them again.
+
+
+def iter_dump_chunks(
+    path: Path,
+    format: str,
+    compression: str,
+    offset: int = 0,
+    start: int = 0,
+    batch_size: int = 512,
+) -> Iterator[tuple[int, int, int]]:
+    """
+    Iterate through the `(start, end, skip)` byte ranges a dump is decoded in.
+
+    Each range starts on a record boundary and holds about `batch_size`
+    records (at least one index stride, or one block); `skip` is the number
+    of records still to be skipped at its start to honor `offset`.
+    """
+    if compression != "none":
+        with path.open("rb") as f:
+            for position, size, records in iter_blocks(f, compression, start):
+                if offset >= records:
+                    offset -= records
+                    continue
+                yield position, position + size, offset
+                offset = 0
+        return
+
+    with MappedDump(path, format) as dump:
+        if offset and start == 0:
+            start = dump.record_offset(offset)
+            if start is None:
+                print("Offset is greater than the number of lines in the file.")
+                return
+        elif offset:
+            records = dump.iter_records(start)
+            for _ in range(offset):
+                start += len(next(records, b""))
+        if start >= dump.size:
+            return
+        step = max(batch_size // dump.index.stride, 1)
+        bounds = [bound for bound in dump.index.offsets if bound > start][::step]
+        for end in [*bounds, dump.size]:
+            yield start, end, 0
+            start = end
+
+
+def decode_chunk(
+    path: Path,
+    format: str,
+    compression: str,
+    start: int,
+    end: int,
+    skip: int,
+    batch_size: int,
+) -> list[tuple[list[bytes], int]]:
+    """
+    Decode the records between bytes `start` and `end` of a dump into BSON.
+
+    Returns `(documents, end)` batches of up to `batch_size` documents, with
+    the byte offset right after each batch. A block of a compressed dump is
+    a single batch, since a restore cannot resume in the middle of a block.
+    """
+    with path.open("rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    if compression != "none":
+        records = split_records(decompress_block(data, compression), format)[skip:]
+        return [(encode_records(records, format), end)]
+
+    # Uncompressed chunks start right at the offset, so there is nothing to skip.
+    batches = []
+    records = split_records(data, format)
+    position = start
+    for i in range(0, len(records), batch_size):
+        batch = records[i : i + batch_size]
+        position += sum(map(len, batch))
+        batches.append((encode_records(batch, format), position))
+    return batches
+
+
+def encode_records(records: list[bytes], format: str) -> list[bytes]:
+    if format == "bson":
+        return records
+    return [bson.encode(with_id(decode_record(record, format))) for record in records]
+
+
+def with_id(document: dict) -> dict:
+    # Raw documents are inserted as they are, so the driver cannot add an `_id`.
+    if "_id" not in document:
+        document["_id"] = ObjectId()
+    return document
+
+
+def iter_decoded_batches(
+    path: Path,
+    offset: int = 0,
+    limit: int = -1,
+    start: int = 0,
+    processes: int = 2,
+    batch_size: int = 512,
+) -> Iterator[tuple[list[RawBSONDocument], int]]:
+    """
+    Iterate through `(batch, end)` pairs of a dump decoded by `processes` workers.
+
+    Same as `iter_dump_batches`, but chunks are decoded ahead by a process
+    pool, at most twice as many as there are processes, and come back in order.
+    """
+    format = dump_format(path)
+    compression = detect_compression(path)
+    chunks = iter_dump_chunks(path, format, compression, offset, start, batch_size)
+
+    def iter_decoded() -> Iterator[tuple[list[bytes], int]]:
+        # Forking a process that runs driver threads is unsafe, so workers are spawned.
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(processes, mp_context=context) as executor:
+            pending = deque()
+            for chunk in chunks:
+                args = (path, format, compression, *chunk, batch_size)
+                pending.append(executor.submit(decode_chunk, *args))
+                if len(pending) >= 2 * processes:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+
+    remaining = limit
+    for batch, end in iter_decoded():
+        if remaining == 0:
+            return
+        if remaining != -1:
+            batch = batch[:remaining]
+            remaining -= len(batch)
+        yield [RawBSONDocument(doc) for doc in batch], end
@@ -0,0 +1,209 @@
+import json
+import os
+import time
+from datetime import datetime
+from enum import Enum
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator, Optional
+
+import bson
+from bson import json_util
+from bson.json_util import CANONICAL_JSON_OPTIONS
+from bson.objectid import ObjectId
+from bson.raw_bson import RawBSONDocument
+
+from .compression import SUFFIXES, compress_chunks
+from .index import RecordIndex, build_index, iter_indexed
+from .metrics import Metrics, timed
+
+try:
+    import orjson
+except ImportError:  # optional, see requirements-fast.txt
+    orjson = None
+
+# Dump formats, by file extension:
+# json: one JSON document per line, with ObjectIds and datetimes as strings.
+# extjson: one canonical Extended JSON document per line, so types round-trip.
+# bson: concatenated raw BSON documents (each one is length-prefixed), like mongodump.
+EXTENSIONS = {"json": ".jsonl", "extjson": ".extjson.jsonl", "bson": ".bson"}
+
+
+class DumpFormat(str, Enum):
+    json = "json"
+    extjson = "extjson"
+    bson = "bson"
+
+
+class CustomJSONEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, datetime):
+            return obj.isoformat()
+        elif isinstance(obj, ObjectId):
+            return str(obj)
+        elif isinstance(obj, bytes):
+            return obj.decode("utf-8")
+        elif type(obj).__module__ == "numpy" and hasattr(obj, "item"):
+            return obj.item()  # numpy scalars, without importing numpy
+        return super().default(obj)
+
+
+# Encoders are reusable, and building one per document costs as much as encoding.
+JSON_ENCODER = CustomJSONEncoder()
+
+
+def dump_name(
+    collection_name: str,
+    format: str = "json",
+    compression: str = "none",
+) -> str:
+    return f"{collection_name}{EXTENSIONS[format]}{SUFFIXES[compression]}"
+
+
+def dump_format(file: Path) -> str:
+    """Format of a dump file, from its extension."""
+    name = file.name
+    for suffix in SUFFIXES.values():
+        if suffix and name.endswith(suffix):
+            name = name.removesuffix(suffix)
+    for format in ("extjson", "json", "bson"):
+        if name.endswith(EXTENSIONS[format]):
+            return format
+    raise ValueError(f"Unknown dump format: '{file}'.")
+
+
+def dump_collection(file: Path) -> str:
+    """Collection name of a dump file, e.g. "dog" for "dog.bson.gz"."""
+    name = file.name
+    for suffix in SUFFIXES.values():
+        if suffix and name.endswith(suffix):
+            name = name.removesuffix(suffix)
+    return name.removesuffix(EXTENSIONS[dump_format(file)])
+
+
+def iter_encoded(documents: Iterable, format: str) -> Iterator[bytes]:
+    """Encode documents one by one as the records of a dump."""
+    if format == "bson":
+        for doc in documents:
+            yield doc.raw if isinstance(doc, RawBSONDocument) else bson.encode(doc)
+    elif format == "extjson":
+        for doc in documents:
+            line = json_util.dumps(doc, json_options=CANONICAL_JSON_OPTIONS)
+            yield f"{line}\n".encode()
+    else:
+        for doc in documents:
+            yield f"{JSON_ENCODER.encode(doc)}\n".encode()
+
+
+def encode_documents(documents: Iterable, format: str) -> bytes:
+    return b"".join(iter_encoded(documents, format))
+
+
+class DumpWriter:
+    """
+    Append batches of documents to a dump, one block per batch.
+
+    The file stays open between batches, and documents are encoded one by
+    one into a large write buffer, so no batch-sized string is ever built.
+    Every batch is flushed and fsynced before `write` returns, so the
+    returned size can be checkpointed.
+
+    With `index`, the record index of an uncompressed dump is kept up to date
+    as records are written, and saved next to it on close.
+    """
+
+    def __init__(
+        self,
+        file: Path,
+        format: str = "json",
+        compression: str = "none",
+        buffer_size: int = 1 << 20,
+        index: bool = False,
+    ) -> None:
+        self.file = file
+        self.format = format
+        self.compression = compression
+        file.parent.mkdir(parents=True, exist_ok=True)
+        self.f = open(file, "ab", buffering=buffer_size)
+        self.index = None
+        if index and compression == "none":
+            self.index = build_index(file, format, base=RecordIndex.load(file))
+        # Bytes of records written before compression, to size batches with.
+        self.encoded_bytes = 0
+
+    def write(self, documents: list, metrics: Optional[Metrics] = None) -> int:
+        """
+        Append `documents` as one block and return the new size of the dump.
+
+        With `metrics`, the time spent encoding and compressing is added to
+        its "serialize" phase and the rest to its "write" phase.
+        """
+        start = time.perf_counter()
+        serialize = []
+        chunks = self.iter_counted(iter_encoded(documents, self.format))
+        if self.index is not None:
+            chunks = iter_indexed(chunks, self.index)
+        chunks = compress_chunks(chunks, len(documents), self.compression)
+        if metrics is not None:
+            chunks = timed(chunks, serialize.append)
+        self.f.writelines(chunks)
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        if metrics is not None:
+            metrics.add_time("serialize", sum(serialize))
+            metrics.add_time("write", time.perf_counter() - start - sum(serialize))
+        return self.f.tell()
+
+    def iter_counted(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        for chunk in chunks:
+            self.encoded_bytes += len(chunk)
+            yield chunk
+
+    def close(self):
+        self.f.close()
+        if self.index is not None:
+            self.index.save(self.file)
+
+    def __enter__(self) -> "DumpWriter":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def split_records(data: bytes, format: str) -> list[bytes]:
+    """Split a block of dump data into its records."""
+    if format != "bson":
+        return data.splitlines(keepends=True)
+    records = []
+    position = 0
+    while position < len(data):
+        size = int.from_bytes(data[position : position + 4], "little")
+        records.append(data[position : position + size])
+        position += size
+    return records
+
+
+def read_records(f: BinaryIO, format: str) -> Iterator[bytes]:
+    """Iterate through the records of an uncompressed dump."""
+    if format != "bson":
+        yield from f
+        return
+    while header := f.read(4):
+        size = int.from_bytes(header, "little")
+        record = header + f.read(size - 4)
+        if len(record) < size:
+            raise ValueError(f"'{f.name}' ends with a truncated document.")
+        yield record
+
+
+def decode_record(record: bytes, format: str):
+    if format == "bson":
+        return RawBSONDocument(record)
+    if format == "extjson":
+        return json_util.loads(record)
+    if orjson is not None:
+        try:
+            return orjson.loads(record)
+        except orjson.JSONDecodeError:  # e.g. NaN, which orjson rejects
+            pass
+    return json.loads(record)
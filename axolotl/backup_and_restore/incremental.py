@@ -0,0 +1,77 @@
+from typing import Iterator, Optional
+
+from pymongo import ASCENDING, DeleteOne, ReplaceOne
+from pymongo.collection import Collection
+
+# Delta records are either {"op": "upsert", "_id": ..., "doc": {...}} or
+# {"op": "delete", "_id": ...}. They are written as Extended JSON, so `_id`s
+# keep their type and replaying them matches the restored documents.
+
+
+def change_record(change: dict) -> Optional[dict]:
+    """Turn a change stream event into a delta record, or None if there is nothing to apply."""
+    operation = change["operationType"]
+    if operation in ("insert", "update", "replace"):
+        # An update looked up after the document was deleted has no full
+        # document; the delete event that follows takes care of it.
+        if change.get("fullDocument") is None:
+            return None
+        return {
+            "op": "upsert",
+            "_id": change["documentKey"]["_id"],
+            "doc": change["fullDocument"],
+        }
+    if operation == "delete":
+        return {"op": "delete", "_id": change["documentKey"]["_id"]}
+    raise ValueError(f"Cannot replay a '{operation}' change, take a new base backup.")
+
+
+def record_operation(record: dict) -> ReplaceOne | DeleteOne:
+    if record["op"] == "delete":
+        return DeleteOne({"_id": record["_id"]})
+    return ReplaceOne({"_id": record["_id"]}, record["doc"], upsert=True)
+
+
+def iter_watermark_changes(
+    collection: Collection,
+    field: str,
+    state: dict,
+    batch_size: int,
+) -> Iterator[dict]:
+    """
+    Iterate through upserts of the documents whose `field` is at least `state["watermark"]`.
+
+    `state["watermark"]` is moved to the largest value seen. The previous
+    watermark is included, so documents written at the same instant as the
+    last run are never missed; replaying them again is harmless.
+    """
+    if state["watermark"] is None:
+        query = {field: {"$exists": True}}
+    else:
+        query = {field: {"$gte": state["watermark"]}}
+    cursor = collection.find(query, sort=[(field, ASCENDING)], batch_size=batch_size)
+    for doc in cursor:
+        state["watermark"] = doc.get(field, state["watermark"])
+        yield {"op": "upsert", "_id": doc["_id"], "doc": doc}
+
+
+def iter_stream_changes(collection: Collection, state: dict) -> Iterator[dict]:
+    """
+    Iterate through the delta records of the changes since `state["resume_token"]`.
+
+    Stops once the change stream has caught up, and moves
+    `state["resume_token"]` past the last change.
+    """
+    with collection.watch(
+        resume_after=state["resume_token"],
+        full_document="updateLookup",
+        max_await_time_ms=1000,
+    ) as stream:
+        while stream.alive:
+            change = stream.try_next()
+            if change is None:
+                break
+            record = change_record(change)
+            if record is not None:
+                yield record
+        state["resume_token"] = stream.resume_token
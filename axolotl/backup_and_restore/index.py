@@ -0,0 +1,208 @@
+import mmap
+import os
+import struct
+from bisect import bisect_left
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, Iterator, Optional
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# A record index is a `<dump>.idx` sidecar holding the byte offset of every
+# `stride`-th record of an uncompressed dump, so any record is one lookup and
+# at most `stride - 1` skipped records away, and the dump can be cut into byte
+# ranges on record boundaries. Its header holds the stride, the number of
+# records and the size of the dump it covers; an index that does not cover
+# the whole dump is stale, and is extended or rebuilt before use.
+INDEX_HEADER = struct.Struct("<8sQQQ")
+INDEX_MAGIC = b"AXIDX\x00\x00\x01"
+INDEX_STRIDE = 1024
+SCAN_CHUNK = 64 << 20
+
+
+def index_path(dump: Path) -> Path:
+    return dump.with_name(f"{dump.name}.idx")
+
+
+class RecordIndex:
+    def __init__(
+        self,
+        stride: int = INDEX_STRIDE,
+        offsets: Optional[list[int]] = None,
+        records: int = 0,
+        size: int = 0,
+    ) -> None:
+        self.stride = stride
+        self.offsets = [] if offsets is None else offsets
+        self.records = records
+        self.size = size
+
+    def add(self, record_size: int):
+        """Account for the next record of the dump."""
+        if self.records % self.stride == 0:
+            self.offsets.append(self.size)
+        self.records += 1
+        self.size += record_size
+
+    def add_ends(self, ends: "np.ndarray"):
+        """Account for the records ending right before the byte offsets `ends`."""
+        import numpy as np
+
+        if not len(ends):
+            return
+        starts = np.concatenate(([self.size], ends[:-1]))
+        numbers = np.arange(self.records, self.records + len(ends))
+        self.offsets.extend(starts[numbers % self.stride == 0].tolist())
+        self.records += len(ends)
+        self.size = int(ends[-1])
+
+    def save(self, dump: Path):
+        import numpy as np
+
+        path = index_path(dump)
+        tmp = path.with_name(f"{path.name}.tmp")
+        with tmp.open("wb") as f:
+            header = (INDEX_MAGIC, self.stride, self.records, self.size)
+            f.write(INDEX_HEADER.pack(*header))
+            f.write(np.asarray(self.offsets, dtype="<u8").tobytes())
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, dump: Path) -> Optional["RecordIndex"]:
+        import numpy as np
+
+        path = index_path(dump)
+        if not path.exists():
+            return None
+        data = path.read_bytes()
+        magic, stride, records, size = INDEX_HEADER.unpack_from(data)
+        if magic != INDEX_MAGIC:
+            return None
+        offsets = np.frombuffer(data, dtype="<u8", offset=INDEX_HEADER.size)
+        return cls(stride, offsets.tolist(), records, size)
+
+
+def build_index(
+    dump: Path,
+    format: str,
+    base: Optional[RecordIndex] = None,
+) -> RecordIndex:
+    """
+    Index a dump, reusing whatever part of a stale `base` index still holds.
+
+    Dumps only ever grow, or get truncated back on resume, so `base` is
+    either extended from its end or cut back to its last entry in the dump.
+    """
+    size = dump.stat().st_size if dump.exists() else 0
+    index = RecordIndex()
+    if base is not None and base.size <= size:
+        index = base
+    elif base is not None:
+        kept = bisect_left(base.offsets, size)
+        if kept:
+            index = RecordIndex(
+                base.stride,
+                base.offsets[: kept - 1],
+                (kept - 1) * base.stride,
+                base.offsets[kept - 1],
+            )
+    if index.size == size:
+        return index
+
+    with dump.open("rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if format == "bson":
+            while index.size < size:
+                index.add(int.from_bytes(mm[index.size : index.size + 4], "little"))
+        else:
+            import numpy as np
+
+            # Newlines are found by numpy, a chunk at a time, not line by line.
+            data = np.frombuffer(mm, np.uint8)
+            for chunk_start in range(index.size, size, SCAN_CHUNK):
+                chunk = data[chunk_start : chunk_start + SCAN_CHUNK]
+                index.add_ends(np.flatnonzero(chunk == 10) + chunk_start + 1)
+            del data, chunk  # views of the mmap keep it from closing
+            if index.size < size:  # a last line without a newline
+                index.add(size - index.size)
+    return index
+
+
+class MappedDump:
+    """
+    Read the records of an uncompressed dump through mmap.
+
+    Records are located with the dump's record index, which is loaded from
+    its sidecar, or built on first use and saved for next time.
+    """
+
+    def __init__(self, dump: Path, format: str) -> None:
+        self.dump = dump
+        self.format = format
+        self.f = dump.open("rb")
+        self.size = os.fstat(self.f.fileno()).st_size
+        self.mm = b""
+        if self.size:
+            self.mm = mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._index = None
+
+    @property
+    def index(self) -> RecordIndex:
+        if self._index is None:
+            index = RecordIndex.load(self.dump)
+            if index is None or index.size != self.size:
+                index = build_index(self.dump, self.format, base=index)
+                try:
+                    index.save(self.dump)
+                except OSError:  # e.g. a read-only backup
+                    pass
+            self._index = index
+        return self._index
+
+    def next_record(self, position: int) -> int:
+        """Byte offset of the end of the record starting at `position`."""
+        if self.format == "bson":
+            end = position + int.from_bytes(self.mm[position : position + 4], "little")
+            if end > self.size:
+                raise ValueError(f"'{self.dump}' ends with a truncated document.")
+            return end
+        end = self.mm.find(b"\n", position)
+        return self.size if end == -1 else end + 1
+
+    def record_offset(self, n: int) -> Optional[int]:
+        """Byte offset of record `n`, or None past the last record."""
+        index = self.index
+        if n >= index.records:
+            return None
+        position = index.offsets[n // index.stride]
+        for _ in range(n % index.stride):
+            position = self.next_record(position)
+        return position
+
+    def iter_records(
+        self, start: int = 0, end: Optional[int] = None
+    ) -> Iterator[bytes]:
+        """Iterate through the records between byte offsets `start` and `end`."""
+        end = self.size if end is None else end
+        position = start
+        while position < end:
+            next_position = self.next_record(position)
+            yield self.mm[position:next_position]
+            position = next_position
+
+    def close(self):
+        if self.size:
+            self.mm.close()
+        self.f.close()
+
+    def __enter__(self) -> "MappedDump":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def iter_indexed(chunks: Iterable[bytes], index: RecordIndex) -> Iterator[bytes]:
+    """Pass encoded records through, adding each of them to `index`."""
+    for chunk in chunks:
+        index.add(len(chunk))
+        yield chunk
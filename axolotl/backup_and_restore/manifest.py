@@ -0,0 +1,176 @@
+import glob
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Optional
+
+from .checkpoint import Checkpoint
+from .compression import detect_compression
+from .formats import EXTENSIONS, dump_format
+from .storage import Storage
+
+# Backups can rotate their output into numbered chunks of about `chunk_size`
+# bytes, `<collection>.chunk-0000.jsonl`, `<collection>.chunk-0001.jsonl`,
+# ..., listed in order by a `<collection>.manifest.json`, like the parts of a
+# partitioned backup. Database backups also write a `manifest.json` listing
+# every collection with its metadata sidecar and chunks, each with its
+# document count, size, SHA-256, format and compression, so a backup can be
+# verified and restored chunk by chunk, in parallel.
+MANIFEST = "manifest.json"
+
+
+def chunk_name(name: str, chunk: int) -> str:
+    return f"{name}.chunk-{chunk:04d}"
+
+
+def file_checksum(file: Path) -> str:
+    """SHA-256 of a file, as a hex string."""
+    with open(file, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def chunk_entry(file: Path, documents: int, format: str, compression: str) -> dict:
+    """Manifest entry of a finished dump file of `documents` documents."""
+    return {
+        "file": file.name,
+        "documents": documents,
+        "bytes": file.stat().st_size,
+        "sha256": file_checksum(file),
+        "format": format,
+        "compression": compression,
+    }
+
+
+def verify_chunk(path: Path, chunk: dict):
+    """Raise a `ValueError` if a chunk does not match its manifest entry."""
+    file = path / chunk["file"]
+    if not file.exists():
+        raise ValueError(f"'{file}' is missing.")
+    if file.stat().st_size != chunk["bytes"] or file_checksum(file) != chunk["sha256"]:
+        raise ValueError(f"'{file}' does not match its checksum.")
+
+
+def save_collection_manifest(
+    path: Path, name: str, format: str, compression: str, chunks: list[dict]
+) -> dict:
+    """Save the manifest of a collection dumped to several files, in order."""
+    manifest = {
+        "collection": name,
+        "format": format,
+        "compression": compression,
+        "documents": sum(chunk["documents"] for chunk in chunks),
+        "parts": [chunk for chunk in chunks if chunk["documents"] > 0],
+    }
+    with open(path / f"{name}.manifest.json", "w") as f:
+        json.dump(manifest, f, indent=4)
+    return manifest
+
+
+def dump_chunks(dump: Path) -> list[dict]:
+    """Manifest entries of the files of a dump, as listed by `list_dumps`."""
+    if dump.name.endswith(".metadata.json"):
+        return []
+    if dump.name.endswith(".manifest.json"):
+        with dump.open() as f:
+            manifest = json.load(f)
+        return [
+            (
+                part
+                if "sha256" in part
+                else chunk_entry(
+                    dump.parent / part["file"],
+                    part["documents"],
+                    manifest["format"],
+                    manifest["compression"],
+                )
+            )
+            for part in manifest["parts"]
+        ]
+    state = Checkpoint(dump).load()
+    if state is not None and "chunks" in state:
+        return state["chunks"]
+    # A dump saved before manifests, or by `save_jsonl`, without a checkpoint.
+    documents = None if state is None else state["documents"]
+    return [chunk_entry(dump, documents, dump_format(dump), detect_compression(dump))]
+
+
+def save_db_manifest(path: Path, db: str, dumps: list[tuple[str, Path]]) -> dict:
+    """Save `path/manifest.json`, listing the chunks of every `(name, dump)`."""
+    collections = []
+    for name, dump in dumps:
+        metadata = path / f"{name}.metadata.json"
+        chunks = dump_chunks(dump)
+        collections.append(
+            {
+                "collection": name,
+                "metadata": metadata.name if metadata.exists() else None,
+                "documents": sum(chunk["documents"] or 0 for chunk in chunks),
+                "bytes": sum(chunk["bytes"] for chunk in chunks),
+                "chunks": chunks,
+            }
+        )
+    manifest = {"database": db, "collections": collections}
+    tmp = path / f"{MANIFEST}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=4)
+    os.replace(tmp, path / MANIFEST)
+    return manifest
+
+
+def load_db_manifest(path: Path) -> Optional[dict]:
+    """The `manifest.json` of a database backup, if it has one."""
+    file = path / MANIFEST
+    if not file.exists():
+        return None
+    with file.open() as f:
+        return json.load(f)
+
+
+def stale_dumps(path: Path, name: str) -> list[Path]:
+    """
+    Files of every previous backup of `name` in `path`, with their sidecars:
+    plain dumps, chunks, partitions, manifests and incremental deltas.
+    """
+    name = glob.escape(name)
+    patterns = [f"{name}{extension}*" for extension in EXTENSIONS.values()]
+    patterns += [
+        f"{name}.chunk-*",
+        f"{name}.part-*",
+        f"{name}.delta-*",
+        f"{name}.manifest.json",
+        f"{name}.incremental.json",
+    ]
+    return sorted({file for pattern in patterns for file in path.glob(pattern)})
+
+
+def upload_backup(storage: Storage, path: Path, manifest: dict):
+    """
+    Upload what is left of a database backup staged in `path`: chunks not
+    uploaded yet, metadata and manifests, and `manifest.json` last, so that a
+    backup is only listed once all of it is stored.
+    """
+    for collection in manifest["collections"]:
+        names = [chunk["file"] for chunk in collection["chunks"]]
+        names.append(f"{collection['collection']}.manifest.json")
+        if collection["metadata"]:
+            names.append(collection["metadata"])
+        for name in names:
+            if (path / name).exists():
+                storage.upload(path / name, name)
+    storage.upload(path / MANIFEST, MANIFEST)
+
+
+def download_backup(storage: Storage, path: Path) -> dict:
+    """
+    Download the `manifest.json` and metadata of a database backup to `path`,
+    leaving its chunks to be downloaded one by one. Returns the manifest.
+    """
+    if not storage.exists(MANIFEST):
+        raise ValueError(f"No {MANIFEST} in the backup.")
+    storage.download(MANIFEST, path / MANIFEST)
+    manifest = load_db_manifest(path)
+    for collection in manifest["collections"]:
+        if collection["metadata"]:
+            storage.download(collection["metadata"], path / collection["metadata"])
+    return manifest
@@ -0,0 +1,110 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+from pymongo import IndexModel
+from pymongo.collection import Collection
+from pymongo.database import Database
+
+from .checkpoint import Checkpoint
+from .formats import dump_collection
+
+# Backups save the options (validator, collation, capped size, view pipeline,
+# ...) and indexes of every collection to a `<collection>.metadata.json`
+# sidecar. Restores create the collection with those options, load the
+# documents while only the `_id` index exists, and build the other indexes
+# at the end: one build over the loaded data is much cheaper than keeping
+# every index up to date on each insert.
+
+
+def metadata_file(dump: Path) -> Path:
+    """Metadata sidecar of a dump file, a partitioned dump's manifest, or itself."""
+    if dump.name.endswith(".metadata.json"):
+        return dump
+    if dump.name.endswith(".manifest.json"):
+        name = dump.name.removesuffix(".manifest.json")
+    else:
+        name = dump_collection(dump)
+    return dump.with_name(f"{name}.metadata.json")
+
+
+def save_metadata(collection: Collection, path: Path):
+    """Save the options and indexes of `collection` to `path/<collection>.metadata.json`."""
+    infos = collection.database.list_collections(filter={"name": collection.name})
+    info = next(infos, None)
+    if info is None:
+        return
+    metadata = {
+        "collection": collection.name,
+        "type": info.get("type", "collection"),
+        "options": info.get("options", {}),
+        "indexes": (
+            [] if info.get("type") == "view" else list(collection.list_indexes())
+        ),
+    }
+    Checkpoint(path / collection.name, "metadata").save(metadata)
+
+
+def load_metadata(dump: Path) -> Optional[dict]:
+    """The saved metadata of a dump's collection, if the backup has any."""
+    file = metadata_file(dump)
+    name = file.name.removesuffix(".metadata.json")
+    return Checkpoint(file.with_name(name), "metadata").load()
+
+
+def create_collection(db: Database, name: str, metadata: dict) -> bool:
+    """
+    Create collection `name` with the saved options, unless it already exists.
+
+    Returns whether it was created.
+    """
+    if db.list_collection_names(filter={"name": name}):
+        return False
+    db.create_collection(name, **metadata["options"])
+    return True
+
+
+def index_keys(index: dict) -> list[tuple]:
+    # Text indexes list their fields under `weights`, not in their key.
+    keys = []
+    for field, direction in index["key"].items():
+        if field == "_fts":
+            keys.extend((name, "text") for name in index["weights"])
+        elif field != "_ftsx":
+            keys.append((field, direction))
+    return keys
+
+
+def index_models(indexes: list[dict]) -> list[IndexModel]:
+    """Saved index specifications as `IndexModel`s, leaving out the `_id` index."""
+    models = []
+    for index in indexes:
+        if index["name"] == "_id_":
+            continue
+        options = {k: v for k, v in index.items() if k not in ("key", "v", "ns")}
+        models.append(IndexModel(index_keys(index), **options))
+    return models
+
+
+def build_indexes(collection: Collection, indexes: list[dict], workers: int = 1) -> int:
+    """
+    Build the saved `indexes` of a collection, skipping the ones that exist.
+
+    With one worker, every index is built by a single `createIndexes`, which
+    scans the collection once. With more, the indexes are split across up to
+    `workers` concurrent `createIndexes` commands. Returns the number of
+    indexes built.
+    """
+    existing = {index["name"] for index in collection.list_indexes()}
+    models = [m for m in index_models(indexes) if m.document["name"] not in existing]
+    if not models:
+        return 0
+    print(f"Building {len(models)} indexes on '{collection.full_name}'.")
+    if workers <= 1:
+        collection.create_indexes(models)
+    else:
+        groups = [models[i::workers] for i in range(min(workers, len(models)))]
+        with ThreadPoolExecutor(max_workers=len(groups)) as executor:
+            list(executor.map(collection.create_indexes, groups))
+    print(f"Built {len(models)} indexes on '{collection.full_name}'.")
+    return len(models)
@@ -0,0 +1,217 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import partial
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional, TypeVar
+
+# Backups, restores and moves report their progress as metric events, plain
+# dicts handed to every hook: a "batch" event after each batch and a "done"
+# event at the end. Hooks added with `add_hook` get the events of every
+# operation in the process, and clients take hooks of their own.
+#
+# Events carry the time spent in each phase, so a slow job shows whether it
+# waits on the server (fetch, insert), the CPU (serialize, read) or the
+# disk (write).
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+Hook = Callable[[dict], None]
+HOOKS: list[Hook] = []
+T = TypeVar("T")
+_END = object()
+
+
+def add_hook(hook: Hook):
+    HOOKS.append(hook)
+
+
+def remove_hook(hook: Hook):
+    HOOKS.remove(hook)
+
+
+def timed(items: Iterable[T], on_time: Callable[[float], None]) -> Iterator[T]:
+    """Iterate through `items`, passing the time spent producing each one to `on_time`."""
+    iterator = iter(items)
+    while True:
+        start = time.perf_counter()
+        item = next(iterator, _END)
+        on_time(time.perf_counter() - start)
+        if item is _END:
+            return
+        yield item
+
+
+class Metrics:
+    """
+    Throughput, batch latency and time split of one operation on one collection.
+
+    Phases of concurrent batches overlap, so their sum can exceed the
+    elapsed time. With a `total` number of documents or `total_bytes`,
+    events also carry an ETA.
+    """
+
+    def __init__(
+        self,
+        operation: str,
+        collection: str,
+        total: Optional[int] = None,
+        total_bytes: Optional[int] = None,
+        hooks: Iterable[Hook] = (),
+    ) -> None:
+        self.operation = operation
+        self.collection = collection
+        self.total = total
+        self.total_bytes = total_bytes
+        self.hooks = [*HOOKS, *hooks]
+        self.start = time.perf_counter()
+        self.documents = 0
+        self.bytes = 0
+        self.phases = {}
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.lock = threading.Lock()
+
+    def add_time(self, phase: str, seconds: float):
+        with self.lock:
+            self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    @contextmanager
+    def timer(self, phase: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(phase, time.perf_counter() - start)
+
+    def timed(self, items: Iterable[T], phase: str) -> Iterator[T]:
+        """Iterate through `items`, adding the time spent producing each one to `phase`."""
+        return timed(items, partial(self.add_time, phase))
+
+    def batch(self, documents: int, size: int, latency: float):
+        """Record a batch of `documents` documents and `size` bytes that took `latency` seconds."""
+        with self.lock:
+            self.documents += documents
+            self.bytes += size
+            self.buckets[bisect_left(LATENCY_BUCKETS, latency)] += 1
+            self.latency_sum += latency
+            event = self.snapshot("batch")
+        event["latency"] = round(latency, 6)
+        self.emit(event)
+
+    def done(self):
+        with self.lock:
+            event = self.snapshot("done")
+        self.emit(event)
+
+    def snapshot(self, event: str) -> dict:
+        elapsed = time.perf_counter() - self.start
+        docs_per_s = self.documents / elapsed if elapsed else 0.0
+        bytes_per_s = self.bytes / elapsed if elapsed else 0.0
+        eta = None
+        if self.total is not None and docs_per_s:
+            eta = round(max(self.total - self.documents, 0) / docs_per_s, 3)
+        elif self.total_bytes is not None and bytes_per_s:
+            eta = round(max(self.total_bytes - self.bytes, 0) / bytes_per_s, 3)
+        counts, cumulative = {}, 0
+        for bound, count in zip([*map(str, LATENCY_BUCKETS), "+Inf"], self.buckets):
+            cumulative += count
+            counts[bound] = cumulative
+        return {
+            "event": event,
+            "time": time.time(),
+            "operation": self.operation,
+            "collection": self.collection,
+            "documents": self.documents,
+            "total": self.total,
+            "bytes": self.bytes,
+            "elapsed": round(elapsed, 6),
+            "docs_per_s": round(docs_per_s, 3),
+            "bytes_per_s": round(bytes_per_s, 3),
+            "eta": eta,
+            "phases": {phase: round(t, 6) for phase, t in self.phases.items()},
+            "latency_buckets": counts,
+            "latency_sum": round(self.latency_sum, 6),
+        }
+
+    def emit(self, event: dict):
+        for hook in self.hooks:
+            try:
+                hook(event)
+            except Exception as e:  # metrics must never fail the job
+                print(f"Metrics hook {hook!r} failed: {e}")
+
+
+class JsonlMetricsFile:
+    """Hook appending every metric event to a JSON-lines file."""
+
+    def __init__(self, path: Path | str) -> None:
+        self.path = Path(path)
+        self.lock = threading.Lock()
+
+    def __call__(self, event: dict):
+        with self.lock, self.path.open("a") as f:
+            f.write(json.dumps(event) + "\n")
+
+
+class PrometheusTextfile:
+    """
+    Hook keeping a Prometheus textfile (for node_exporter's textfile collector)
+    up to date with the latest event of every operation and collection.
+    """
+
+    def __init__(self, path: Path | str) -> None:
+        self.path = Path(path)
+        self.latest = {}
+        self.lock = threading.Lock()
+
+    def __call__(self, event: dict):
+        with self.lock:
+            self.latest[event["operation"], event["collection"]] = event
+            tmp = self.path.with_name(f"{self.path.name}.tmp")
+            tmp.write_text(self.render())
+            os.replace(tmp, self.path)
+
+    def render(self) -> str:
+        metrics = {
+            "documents_total": ("counter", "Documents processed."),
+            "bytes_total": ("counter", "Dump bytes processed."),
+            "docs_per_second": ("gauge", "Average documents per second."),
+            "bytes_per_second": ("gauge", "Average dump bytes per second."),
+            "eta_seconds": ("gauge", "Estimated seconds left."),
+            "phase_seconds_total": ("counter", "Seconds spent in each phase."),
+            "batch_seconds": ("histogram", "Batch latency in seconds."),
+        }
+        samples = {name: [] for name in metrics}
+        for event in self.latest.values():
+            operation = label_value(event["operation"])
+            collection = label_value(event["collection"])
+            labels = f'operation="{operation}",collection="{collection}"'
+            samples["documents_total"].append(f"{{{labels}}} {event['documents']}")
+            samples["bytes_total"].append(f"{{{labels}}} {event['bytes']}")
+            samples["docs_per_second"].append(f"{{{labels}}} {event['docs_per_s']}")
+            samples["bytes_per_second"].append(f"{{{labels}}} {event['bytes_per_s']}")
+            if event["eta"] is not None:
+                samples["eta_seconds"].append(f"{{{labels}}} {event['eta']}")
+            for phase, seconds in event["phases"].items():
+                sample = f'{{{labels},phase="{label_value(phase)}"}} {seconds}'
+                samples["phase_seconds_total"].append(sample)
+            for bound, count in event["latency_buckets"].items():
+                sample = f'_bucket{{{labels},le="{bound}"}} {count}'
+                samples["batch_seconds"].append(sample)
+            samples["batch_seconds"].append(f"_sum{{{labels}}} {event['latency_sum']}")
+            count = event["latency_buckets"]["+Inf"]
+            samples["batch_seconds"].append(f"_count{{{labels}}} {count}")
+
+        lines = []
+        for name, (kind, help) in metrics.items():
+            lines.append(f"# HELP axolotl_{name} {help}")
+            lines.append(f"# TYPE axolotl_{name} {kind}")
+            lines.extend(f"axolotl_{name}{sample}" for sample in samples[name])
+        return "\n".join(lines) + "\n"
+
+
+def label_value(value: str) -> str:
+    """Escape a Prometheus label value: backslashes, double quotes and newlines."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
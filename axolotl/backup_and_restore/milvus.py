@@ -0,0 +1,140 @@
+import json
+import os
+from itertools import islice
+from pathlib import Path
+
+import numpy as np
+from pymilvus import Collection, CollectionSchema, DataType, connections, utility
+
+from .formats import DumpWriter
+
+# A Milvus dump is made of:
+# <collection>.milvus.json: schema, row count and the shape of every vector field.
+# <collection>.jsonl: the other fields, one row per line.
+# <collection>.<field>.f32: each float vector field as a row-major float32
+#   matrix, in the same row order, so it can be memory-mapped back with numpy.
+
+
+def connect_milvus(alias: str = "default"):
+    connections.connect(
+        alias=alias,
+        uri=os.environ["MILVUS_HOST"],
+        password=os.getenv("MILVUS_PASSWORD", ""),
+        token=os.getenv("MILVUS_TOKEN", ""),
+        user=os.getenv("MILVUS_USER", ""),
+    )
+
+
+def vector_fields(schema: CollectionSchema) -> dict[str, int]:
+    """Dimension of every float vector field of a schema, by field name."""
+    return {
+        field.name: field.params["dim"]
+        for field in schema.fields
+        if field.dtype == DataType.FLOAT_VECTOR
+    }
+
+
+def backup_milvus_collection(
+    collection_name: str,
+    path: Path,
+    expr: str = "",
+    limit: int = -1,
+    batch_size: int = 1000,
+) -> int:
+    """
+    Page through a Milvus collection with a query iterator and dump it to `path`.
+
+    Only `batch_size` rows are held in memory at a time. Float vectors are
+    appended to their `.f32` matrix as raw float32, the other fields go to JSONL.
+    """
+    collection = Collection(collection_name)
+    vectors = vector_fields(collection.schema)
+    path.mkdir(parents=True, exist_ok=True)
+    matrices = {
+        field: open(path / f"{collection_name}.{field}.f32", "wb") for field in vectors
+    }
+    scalars_file = path / f"{collection_name}.jsonl"
+    scalars_file.unlink(missing_ok=True)
+    scalars = DumpWriter(scalars_file, format="json")
+    iterator = collection.query_iterator(
+        batch_size=batch_size, limit=limit, expr=expr or None, output_fields=["*"]
+    )
+    total = 0
+    try:
+        while rows := iterator.next():
+            for field, f in matrices.items():
+                matrix = np.asarray([row.pop(field) for row in rows], dtype=np.float32)
+                f.write(matrix.tobytes())
+            scalars.write(rows)
+            total += len(rows)
+            print(f"Downloaded {total} rows of '{collection_name}'.")
+    finally:
+        iterator.close()
+        scalars.close()
+        for f in matrices.values():
+            f.close()
+
+    # Written last, so an interrupted backup is not mistaken for a complete one.
+    metadata = {
+        "collection": collection_name,
+        "schema": collection.schema.to_dict(),
+        "rows": total,
+        "vectors": {
+            field: {"dim": dim, "dtype": "float32"} for field, dim in vectors.items()
+        },
+    }
+    (path / f"{collection_name}.milvus.json").write_text(json.dumps(metadata))
+    return total
+
+
+def restore_milvus_collection(
+    collection_name: str,
+    path: Path,
+    dump_name: str | None = None,
+    batch_size: int = 1000,
+) -> int:
+    """
+    Insert a Milvus dump into `collection_name`, `batch_size` rows at a time.
+
+    The collection is created from the dumped schema if it does not exist.
+    Vectors are read from memory-mapped matrices, so they are never parsed
+    nor fully loaded. With an auto id primary key, rows get new ids.
+    """
+    dump_name = dump_name or collection_name
+    metadata = json.loads((path / f"{dump_name}.milvus.json").read_text())
+    schema = metadata["schema"]
+    for field in schema["fields"]:
+        field["type"] = DataType(field["type"])
+    schema = CollectionSchema.construct_from_dict(schema)
+    if utility.has_collection(collection_name):
+        collection = Collection(collection_name)
+    else:
+        collection = Collection(collection_name, schema=schema)
+    if metadata["rows"] == 0:  # empty files cannot be memory-mapped
+        return 0
+
+    matrices = {
+        field: np.memmap(
+            path / f"{dump_name}.{field}.f32",
+            dtype=vector["dtype"],
+            mode="r",
+            shape=(metadata["rows"], vector["dim"]),
+        )
+        for field, vector in metadata["vectors"].items()
+    }
+    primary_field = schema.primary_field.name if schema.auto_id else None
+    total = 0
+    with open(path / f"{dump_name}.jsonl") as f:
+        while lines := list(islice(f, batch_size)):
+            rows = [json.loads(line) for line in lines]
+            for field, matrix in matrices.items():
+                for row, vector in zip(rows, matrix[total : total + len(rows)]):
+                    row[field] = vector
+            if primary_field is not None:
+                for row in rows:
+                    row.pop(primary_field, None)
+            collection.insert(rows)
+            total += len(rows)
+            print(f"Restored {total}/{metadata['rows']} rows of '{collection_name}'.")
+    collection.flush()
+    return total
@@ -0,0 +1,58 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Optional, TypeVar
+
+T = TypeVar("T")
+_DONE = object()
+
+
+def run_pipeline(
+    batches: Iterable[T],
+    consume: Callable[[T], int],
+    workers: int = 1,
+    max_pending: Optional[int] = None,
+) -> int:
+    """Consume `batches` on `workers` threads; returns the sum of `consume`."""
+    workers = max(workers, 1)
+    pending = queue.Queue(maxsize=max_pending or 2 * workers)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                pending.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def consume_all() -> int:
+        total = 0
+        while not stop.is_set():
+            try:
+                batch = pending.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if batch is _DONE:
+                break
+            try:
+                total += consume(batch)
+            except BaseException:
+                stop.set()
+                raise
+        return total
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(consume_all) for _ in range(workers)]
+        try:
+            for batch in batches:
+                if not put(batch):
+                    break
+        except BaseException:
+            stop.set()
+            raise
+        finally:
+            for _ in range(workers):
+                put(_DONE)
+        return sum(future.result() for future in futures)
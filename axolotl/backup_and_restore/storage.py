@@ -0,0 +1,241 @@
+import os
+import shutil
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Optional
+
+# Backups to "s3://bucket/prefix" are staged locally in AXOLOTL_STAGING_DIR,
+# and every chunk is uploaded as soon as it is written. S3_ENDPOINT_URL points
+# at another S3-compatible endpoint, like MinIO.
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL")
+S3_PART_SIZE = int(os.getenv("S3_PART_SIZE", 16 << 20))
+S3_WORKERS = int(os.getenv("S3_WORKERS", 8))
+STAGING_DIR = os.getenv(
+    "AXOLOTL_STAGING_DIR", os.path.join(tempfile.gettempdir(), "axolotl")
+)
+REMOTE_CHUNK_SIZE = int(os.getenv("REMOTE_CHUNK_SIZE", 256 << 20))
+
+
+def _boto3():
+    try:
+        import boto3
+    except ImportError as e:
+        raise ImportError(
+            "S3 storage requires the boto3 package: pip install axolotl-dbu[s3]"
+        ) from e
+    return boto3
+
+
+class Storage(ABC):
+    """Files kept under a root, addressed by their names relative to it."""
+
+    @abstractmethod
+    def upload(self, file: Path, name: str):
+        """Store the local `file` as `name`."""
+
+    @abstractmethod
+    def download(self, name: str, file: Path):
+        """Copy `name` to the local `file`."""
+
+    @abstractmethod
+    def exists(self, name: str) -> bool:
+        """Whether `name` is stored."""
+
+
+class S3Storage(Storage):
+    """Objects under `prefix` in an S3 bucket, moved `workers` parts at a time."""
+
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "",
+        client: Optional[Any] = None,
+        part_size: int = S3_PART_SIZE,
+        workers: int = S3_WORKERS,
+    ) -> None:
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        if client is None:
+            client = _boto3().client("s3", endpoint_url=S3_ENDPOINT_URL)
+        self.client = client
+        self.part_size = part_size
+        self.workers = max(workers, 1)
+
+    def key(self, name: str) -> str:
+        return f"{self.prefix}/{name}" if self.prefix else name
+
+    def upload(self, file: Path, name: str):
+        with open(file, "rb") as f, self.open_write(name) as writer:
+            shutil.copyfileobj(f, writer, self.part_size)
+
+    def download(self, name: str, file: Path):
+        size = self.size(name)
+        file.parent.mkdir(parents=True, exist_ok=True)
+        with open(file, "wb") as f:
+            f.truncate(size)
+
+            def fetch(start: int):
+                end = min(start + self.part_size, size)
+                os.pwrite(f.fileno(), self.read_range(name, start, end), start)
+
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                list(executor.map(fetch, range(0, size, self.part_size)))
+
+    def open_write(self, name: str) -> "MultipartWriter":
+        return MultipartWriter(self, self.key(name))
+
+    def read_range(self, name: str, start: int, end: int) -> bytes:
+        if end <= start:
+            return b""
+        response = self.client.get_object(
+            Bucket=self.bucket, Key=self.key(name), Range=f"bytes={start}-{end - 1}"
+        )
+        return response["Body"].read()
+
+    def exists(self, name: str) -> bool:
+        key = self.key(name)
+        response = self.client.list_objects_v2(
+            Bucket=self.bucket, Prefix=key, MaxKeys=1
+        )
+        return any(item["Key"] == key for item in response.get("Contents", []))
+
+    def size(self, name: str) -> int:
+        response = self.client.head_object(Bucket=self.bucket, Key=self.key(name))
+        return response["ContentLength"]
+
+
+class MultipartWriter:
+    """Write an S3 object as a multipart upload, sent as parts fill up."""
+
+    def __init__(self, storage: S3Storage, key: str) -> None:
+        self.client = storage.client
+        self.bucket = storage.bucket
+        self.key = key
+        self.part_size = storage.part_size
+        self.buffer = bytearray()
+        self.upload_id: Optional[str] = None
+        self.parts: list[Future] = []
+        self.slots = threading.Semaphore(storage.workers)
+        self.executor = ThreadPoolExecutor(max_workers=storage.workers)
+
+    def write(self, data: bytes) -> int:
+        self.buffer += data
+        while len(self.buffer) >= self.part_size:
+            self.upload_part(bytes(self.buffer[: self.part_size]))
+            del self.buffer[: self.part_size]
+        return len(data)
+
+    def upload_part(self, data: bytes):
+        if self.upload_id is None:
+            response = self.client.create_multipart_upload(
+                Bucket=self.bucket, Key=self.key
+            )
+            self.upload_id = response["UploadId"]
+        for part in self.parts:
+            if part.done() and part.exception() is not None:
+                raise part.exception()
+        self.slots.acquire()
+        self.parts.append(
+            self.executor.submit(self._upload_part, len(self.parts) + 1, data)
+        )
+
+    def _upload_part(self, number: int, data: bytes) -> dict:
+        try:
+            response = self.client.upload_part(
+                Bucket=self.bucket,
+                Key=self.key,
+                UploadId=self.upload_id,
+                PartNumber=number,
+                Body=data,
+            )
+            return {"PartNumber": number, "ETag": response["ETag"]}
+        finally:
+            self.slots.release()
+
+    def close(self):
+        try:
+            if self.upload_id is None:
+                self.client.put_object(
+                    Bucket=self.bucket, Key=self.key, Body=bytes(self.buffer)
+                )
+                return
+            if self.buffer:
+                self.upload_part(bytes(self.buffer))
+            parts = [part.result() for part in self.parts]
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=self.key,
+                UploadId=self.upload_id,
+                MultipartUpload={"Parts": parts},
+            )
+        except BaseException:
+            self.abort()
+            raise
+        finally:
+            self.buffer.clear()
+            self.executor.shutdown()
+
+    def abort(self):
+        self.executor.shutdown(cancel_futures=True)
+        if self.upload_id is not None:
+            self.client.abort_multipart_upload(
+                Bucket=self.bucket, Key=self.key, UploadId=self.upload_id
+            )
+
+    def __enter__(self) -> "MultipartWriter":
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class Uploader:
+    """Upload files in the background, deleting them once uploaded."""
+
+    def __init__(self, storage: Storage, pending: int = 2) -> None:
+        self.storage = storage
+        self.slots = threading.Semaphore(max(pending, 1))
+        self.executor = ThreadPoolExecutor(max_workers=max(pending, 1))
+        self.uploads: list[Future] = []
+
+    def submit(self, file: Path):
+        self.slots.acquire()
+        self.uploads.append(self.executor.submit(self._upload, file))
+
+    def _upload(self, file: Path):
+        try:
+            self.storage.upload(file, file.name)
+            file.unlink()
+        finally:
+            self.slots.release()
+
+    def wait(self):
+        """Wait for every upload, raising the first error."""
+        try:
+            for upload in self.uploads:
+                upload.result()
+        finally:
+            self.executor.shutdown()
+
+
+def is_remote(path: str) -> bool:
+    return "://" in path
+
+
+def open_storage(path: str) -> Storage:
+    """The storage of an "s3://bucket/prefix" URL."""
+    if not path.startswith("s3://"):
+        raise ValueError(f"Unsupported storage: '{path}'.")
+    bucket, _, prefix = path.removeprefix("s3://").partition("/")
+    return S3Storage(bucket, prefix)
+
+
+def staging_dir(path: str) -> Path:
+    """Local directory where the chunks of a remote `path` are staged."""
+    return Path(STAGING_DIR) / path.split("://", 1)[-1].strip("/")
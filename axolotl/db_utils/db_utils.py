@@ -4,10 +4,10 @@ import typer
 from rich import print
 from typer import Option
 
-from axolotl.db_utils.move import (
-    move_mongo_collection,
-    move_mongo_collection_cluster,
-    move_mongo_db_cluster,
+from ..backup_and_restore.backup_and_restore import (
+    parse_hint,
+    parse_query,
+    parse_sort,
 )
 
 app = typer.Typer()
@@ -18,14 +18,28 @@ def move_collection(
     db: Annotated[str, Option("-db", "--database")],
     collection: Annotated[str, Option("-c", "--collection")],
     destination_db: Annotated[str, Option("-dest", "--destination-database")],
+    server_side: Annotated[bool, Option("--server-side")] = False,
+    workers: Annotated[int, Option("-w", "--workers")] = 1,
+    filter: Annotated[Optional[str], Option("--filter")] = None,
+    projection: Annotated[Optional[str], Option("--projection")] = None,
+    sort: Annotated[Optional[str], Option("--sort")] = None,
+    hint: Annotated[Optional[str], Option("--hint")] = None,
     dryrun: Annotated[bool, Option("-dryrun")] = False,
 ):
+    from .move import move_mongo_collection
+
     try:
         move_mongo_collection(
             db=db,
             collection_name=collection,
             destination_db=destination_db,
             dry_run=dryrun,
+            server_side=server_side,
+            workers=workers,
+            filter=parse_query(filter),
+            projection=parse_query(projection),
+            sort=parse_sort(sort),
+            hint=parse_hint(hint),
         )
     except Exception as e:
         print(e)
@@ -38,9 +52,12 @@ def move_collection_cluster(
     db: Annotated[str, Option("-db", "--database")],
     destination_db: Annotated[str, Option("-ddb", "--destination-database")],
     collection: Annotated[str, Option("-c", "--collection")],
-    path: Annotated[str, Option("-p", "--path")],
+    path: Annotated[Optional[str], Option("-p", "--path")] = None,
+    workers: Annotated[int, Option("-w", "--workers")] = 1,
     dryrun: Annotated[bool, Option("-dryrun")] = False,
 ):
+    from .move import move_mongo_collection_cluster
+
     move_mongo_collection_cluster(
         origin_cluster=origin_cluster,
         destination_cluster=destination_cluster,
@@ -49,6 +66,7 @@ def move_collection_cluster(
         collection_name=collection,
         path=path,
         dry_run=dryrun,
+        workers=workers,
     )
 
 
@@ -57,13 +75,44 @@ def move_db_cluster(
     origin_cluster: Annotated[str, Option("-oc", "--origin-cluster")],
     destination_cluster: Annotated[str, Option("-dc", "--destination-cluster")],
     db: Annotated[str, Option("-db", "--database")],
-    path: Annotated[str, Option("-p", "--path")],
+    path: Annotated[Optional[str], Option("-p", "--path")] = None,
+    jobs: Annotated[int, Option("-j", "--jobs")] = 1,
+    workers: Annotated[int, Option("-w", "--workers")] = 1,
     dryrun: Annotated[bool, Option("-dryrun")] = False,
 ):
+    from .move import move_mongo_db_cluster
+
     move_mongo_db_cluster(
         origin_cluster=origin_cluster,
         destination_cluster=destination_cluster,
         db=db,
         path=path,
         dry_run=dryrun,
+        jobs=jobs,
+        workers=workers,
+    )
+
+
+@app.command()
+def sync(
+    origin_cluster: Annotated[str, Option("-oc", "--origin-cluster")],
+    destination_cluster: Annotated[str, Option("-dc", "--destination-cluster")],
+    db: Annotated[str, Option("-db", "--database")],
+    collection: Annotated[Optional[str], Option("-c", "--collection")] = None,
+    jobs: Annotated[int, Option("-j", "--jobs")] = 1,
+    workers: Annotated[int, Option("-w", "--workers")] = 1,
+    path: Annotated[str, Option("-p", "--path")] = ".",
+    dryrun: Annotated[bool, Option("-dryrun")] = False,
+):
+    from .move import sync_mongo_cluster
+
+    sync_mongo_cluster(
+        origin_cluster=origin_cluster,
+        destination_cluster=destination_cluster,
+        db=db,
+        collection_name=collection,
+        dry_run=dryrun,
+        jobs=jobs,
+        workers=workers,
+        path=path,
     )
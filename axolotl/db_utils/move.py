@@ -1,14 +1,120 @@
 import os
-from typing import Optional
+import threading
+import time
+from functools import partial
+from pathlib import Path
+from typing import Callable, Iterable, Optional
 
-import dotenv
-import yaml
-from pymongo import MongoClient
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+from pymongo import ASCENDING
+from pymongo.collection import Collection
+from pymongo.database import Database
+from pymongo.errors import BulkWriteError
 
-from ..backup_and_restore.client import BackupAndRestoreClient
+from ..backup_and_restore.client import (
+    BackupAndRestoreClient,
+    count_documents,
+    iter_id_batches,
+    iter_sorted_batches,
+    mixed_id_types,
+    run_largest_first,
+    save_jsonl,
+)
+from ..backup_and_restore.batching import BATCH_SIZE, BatchSizer
+from ..backup_and_restore.checkpoint import Checkpoint
+from ..backup_and_restore.connections import get_client
+from ..backup_and_restore.formats import dump_name
+from ..backup_and_restore.incremental import change_record, record_operation
+from ..backup_and_restore.metrics import Hook, Metrics
+from ..backup_and_restore.pipeline import run_pipeline
 
-dotenv.load_dotenv()
-BATCH_SIZE = os.getenv("BATCH_SIZE", 512)
+
+def stream_mongo_collection(
+    origin: Collection,
+    destination: Collection,
+    workers: int = 1,
+    path: Optional[str] = None,
+    filter: Optional[dict] = None,
+    projection: Optional[dict] = None,
+    sort: Optional[list] = None,
+    hint: Optional[str | list] = None,
+    resume: bool = False,
+    hooks: Iterable[Hook] = (),
+) -> int:
+    """Copy `origin` into `destination` batch by batch, without a dump."""
+    filter = {} if filter is None else filter
+    if not sort and mixed_id_types(origin, filter):
+        # `_id` range queries only match one type, so read a single cursor.
+        sort = [("_id", ASCENDING)]
+    start = time.perf_counter()
+    total = 0
+    lock = threading.Lock()
+    total_documents = count_documents(origin, filter, hint)
+    metrics = Metrics("move", origin.name, total=total_documents, hooks=hooks)
+    sizer = BatchSizer(BATCH_SIZE)
+    if path is None:
+        # Documents go from one server to the other without being decoded,
+        # and their raw BSON gives the batch sizes.
+        origin = origin.with_options(
+            codec_options=CodecOptions(document_class=RawBSONDocument)
+        )
+
+    def read_batches():
+        if sort:
+            batches = iter_sorted_batches(
+                origin, filter, sizer, sort, projection=projection, hint=hint
+            )
+        else:
+            batches = iter_id_batches(
+                origin, filter, sizer, projection=projection, hint=hint
+            )
+        if path is not None:
+            spill = Path(path) / dump_name(origin.name, "json")
+            spilled = spill.stat().st_size if spill.exists() else 0
+        for batch in metrics.timed(batches, "fetch"):
+            if path is None:
+                size = sum(len(document.raw) for document in batch)
+            else:
+                with metrics.timer("write"):
+                    written = save_jsonl(batch, Path(path), collection_name=origin.name)
+                size, spilled = written - spilled, written
+            yield batch, size
+
+    def insert(batch: tuple[list, int]) -> int:
+        nonlocal total
+        documents, size = batch
+        insert_start = time.perf_counter()
+        try:
+            result = destination.insert_many(documents, ordered=False)
+            inserted = len(result.inserted_ids)
+        except BulkWriteError as e:
+            errors = e.details["writeErrors"]
+            if not resume or any(err["code"] != 11000 for err in errors):
+                raise
+            inserted = e.details["nInserted"]
+        latency = time.perf_counter() - insert_start
+        metrics.add_time("insert", latency)
+        metrics.batch(inserted, size, latency)
+        sizer.observe(len(documents), size, latency)
+        with lock:
+            total += inserted
+            elapsed = time.perf_counter() - start
+            print(
+                f"Moved {total} documents of '{origin.name}' "
+                f"({total / elapsed:.0f} docs/s)."
+            )
+        return inserted
+
+    moved = run_pipeline(read_batches(), insert, workers=workers)
+    metrics.done()
+    elapsed = time.perf_counter() - start
+    print(
+        f"Moved {moved} documents from '{origin.full_name}' to "
+        f"'{destination.full_name}' in {elapsed:.1f}s "
+        f"({moved / max(elapsed, 1e-9):.0f} docs/s)."
+    )
+    return moved
 
 
 def move_mongo_collection(
@@ -17,27 +123,58 @@ def move_mongo_collection(
     collection_name: str,
     dry_run: bool = False,
     db_uri: Optional[str] = None,
+    server_side: bool = False,
+    workers: int = 1,
+    filter: Optional[dict] = None,
+    projection: Optional[dict] = None,
+    sort: Optional[list] = None,
+    hint: Optional[str | list] = None,
+    hooks: Iterable[Hook] = (),
 ):
-    if db_uri is None:
-        db_uri = os.getenv("MONGODB_URI")
-    else:
-        db_uri = db_uri
-
-    client = MongoClient(db_uri)
+    """Copy a collection to another database of the same cluster."""
+    filter = {} if filter is None else filter
+    client = get_client(db_uri)
     collection = client[db][collection_name]
     if not dry_run:
         print(
             f"Moving collection '{collection_name}' from '{db}' to '{destination_db}'."
         )
-        documents = [doc for doc in collection.find()]  # TODO: add abatching
-        print(f"Read {len(documents)} documents.")
-        result = client[destination_db][collection_name].insert_many(documents)
-        print(result.inserted_ids)
+        if server_side:
+            pipeline = [
+                {
+                    "$merge": {
+                        "into": {"db": destination_db, "coll": collection_name},
+                        "whenMatched": "fail",
+                    }
+                }
+            ]
+            if projection:
+                pipeline.insert(0, {"$project": projection})
+            if sort:
+                pipeline.insert(0, {"$sort": dict(sort)})
+            if filter:
+                pipeline.insert(0, {"$match": filter})
+            if hint is not None:
+                collection.aggregate(pipeline, hint=hint)
+            else:
+                collection.aggregate(pipeline)
+            print(f"Merged collection '{collection_name}' on the server.")
+        else:
+            stream_mongo_collection(
+                collection,
+                client[destination_db][collection_name],
+                workers=workers,
+                filter=filter,
+                projection=projection,
+                sort=sort,
+                hint=hint,
+                hooks=hooks,
+            )
     else:
         print(
             f"Will move collection '{collection_name}' from '{db}' to '{destination_db}'."
         )
-        print(f"{collection.count_documents({})} documents in collection.")
+        print(f"{count_documents(collection, filter, hint)} documents in collection.")
 
 
 def move_mongo_collection_cluster(
@@ -46,26 +183,33 @@ def move_mongo_collection_cluster(
     db: str,
     destination_db: str,
     collection_name: str,
-    path: str,
+    path: Optional[str] = None,
     dry_run: bool = False,
+    workers: int = 1,
+    hooks: Iterable[Hook] = (),
 ):
-    with open(os.path.expanduser("~/.config/axolotl-clusters.yml"), "r") as file_object:
-        data = yaml.load(file_object, Loader=yaml.SafeLoader)
-
+    """Stream a collection from one configured cluster to another."""
     try:
-        origin_uri = data[origin_cluster]
-        destination_uri = data[destination_cluster]
-    except KeyError:
-        print(f"Cluster not found in axolotl-clusters config file.")
+        origin_client = BackupAndRestoreClient(origin_cluster, hooks=hooks)
+        destination_client = BackupAndRestoreClient(destination_cluster)
+    except KeyError as e:
+        print(e.args[0])
         return
 
-    origin_client = BackupAndRestoreClient(origin_uri)
-    destination_client = BackupAndRestoreClient(destination_uri)
-
-    origin_client.backup_collection(db=db, collection=collection_name, path=path)
-    path = os.path.join(path, f"{collection_name}.jsonl")
-    destination_client.restore_collection(
-        db=destination_db, collection=collection_name, path=path
+    origin = origin_client.client[db][collection_name]
+    if dry_run:
+        print(
+            f"Will move collection '{collection_name}' from '{origin_cluster}' "
+            f"to '{destination_cluster}'."
+        )
+        print(f"{origin.estimated_document_count()} documents in collection.")
+        return
+    stream_mongo_collection(
+        origin,
+        destination_client.client[destination_db][collection_name],
+        workers=workers,
+        path=path,
+        hooks=origin_client.hooks,
     )
 
 
@@ -73,21 +217,191 @@ def move_mongo_db_cluster(
     origin_cluster: str,
     destination_cluster: str,
     db: str,
-    path: str,
+    path: Optional[str] = None,
     dry_run: bool = False,
+    jobs: int = 1,
+    workers: int = 1,
+    hooks: Iterable[Hook] = (),
 ):
-    with open(os.path.expanduser("~/.config/axolotl-clusters.yml"), "r") as file_object:
-        data = yaml.load(file_object, Loader=yaml.SafeLoader)
-
+    """Stream a database from one configured cluster to another."""
     try:
-        origin_uri = data[origin_cluster]
-        destination_uri = data[destination_cluster]
-    except KeyError:
-        print(f"Cluster not found in axolotl-clusters config file.")
+        origin_client = BackupAndRestoreClient(origin_cluster, hooks=hooks)
+        destination_client = BackupAndRestoreClient(destination_cluster)
+    except KeyError as e:
+        print(e.args[0])
         return
 
-    origin_client = BackupAndRestoreClient(origin_uri)
-    destination_client = BackupAndRestoreClient(destination_uri)
+    if dry_run:
+        print(
+            f"Will move database '{db}' from '{origin_cluster}' "
+            f"to '{destination_cluster}'."
+        )
+        return
+    if path is not None:
+        path = os.path.join(path, db)
+    stream_mongo_db(
+        origin_client, destination_client, db, jobs=jobs, workers=workers, path=path
+    )
+
+
+def stream_mongo_db(
+    origin_client: BackupAndRestoreClient,
+    destination_client: BackupAndRestoreClient,
+    db: str,
+    jobs: int = 1,
+    workers: int = 1,
+    path: Optional[str] = None,
+    resume: bool = False,
+) -> list[dict]:
+    """Stream every collection of `db` to the same database of another cluster."""
+
+    def move(collection_name: str) -> int:
+        return stream_mongo_collection(
+            origin_client.client[db][collection_name],
+            destination_client.client[db][collection_name],
+            workers=workers,
+            path=path,
+            resume=resume,
+            hooks=origin_client.hooks,
+        )
+
+    tasks = [
+        (
+            collection_name,
+            origin_client.collection_size(db, collection_name),
+            partial(move, collection_name),
+        )
+        for collection_name in origin_client.client[db].list_collection_names()
+    ]
+    return run_largest_first(tasks, jobs)
+
+
+def tail_changes(
+    watched: Collection | Database,
+    destination: Database,
+    resume_token: dict,
+    stop: Optional[threading.Event] = None,
+    on_flush: Optional[Callable[[dict], None]] = None,
+) -> int:
+    """Apply the changes to `watched` since `resume_token` to `destination`."""
+    start = time.perf_counter()
+    applied = 0
+    pending: dict[str, list] = {}
+    last_change = None
+
+    def flush(lag: float):
+        nonlocal applied
+        for collection_name, operations in pending.items():
+            destination[collection_name].bulk_write(operations)
+            applied += len(operations)
+        pending.clear()
+        if on_flush is not None:
+            on_flush(resume_token)
+        elapsed = time.perf_counter() - start
+        print(
+            f"Applied {applied} changes ({applied / elapsed:.0f} changes/s), "
+            f"lag {lag:.0f}s."
+        )
+
+    with watched.watch(
+        resume_after=resume_token,
+        full_document="updateLookup",
+        max_await_time_ms=500,
+    ) as stream:
+        try:
+            while stop is None or not stop.is_set():
+                change = stream.try_next()
+                if change is None:
+                    if pending:
+                        resume_token = stream.resume_token
+                        flush(lag=0)
+                    continue
+                last_change = change["clusterTime"].time
+                try:
+                    record = change_record(change)
+                except ValueError:  # drops and renames cannot be replayed
+                    if pending:
+                        flush(lag=max(time.time() - last_change, 0))
+                    raise
+                if record is not None:
+                    operations = pending.setdefault(change["ns"]["coll"], [])
+                    operations.append(record_operation(record))
+                resume_token = stream.resume_token
+                if sum(map(len, pending.values())) >= BATCH_SIZE:
+                    flush(lag=max(time.time() - last_change, 0))
+        except KeyboardInterrupt:
+            print("Stopping the sync.")
+        if pending:
+            flush(lag=max(time.time() - last_change, 0))
+    return applied
+
+
+def sync_mongo_cluster(
+    origin_cluster: str,
+    destination_cluster: str,
+    db: str,
+    collection_name: Optional[str] = None,
+    dry_run: bool = False,
+    jobs: int = 1,
+    workers: int = 1,
+    stop: Optional[threading.Event] = None,
+    path: str = ".",
+    hooks: Iterable[Hook] = (),
+) -> int:
+    """Copy a database or collection to another cluster and keep it in sync."""
+    try:
+        origin_client = BackupAndRestoreClient(origin_cluster, hooks=hooks)
+        destination_client = BackupAndRestoreClient(destination_cluster)
+    except KeyError as e:
+        print(e.args[0])
+        return 0
+
+    name = db if collection_name is None else f"{db}.{collection_name}"
+    if dry_run:
+        print(f"Will sync '{name}' from '{origin_cluster}' to '{destination_cluster}'.")
+        return 0
 
-    origin_client.backup_db(db, path, dry_run=dry_run)
-    destination_client.restore_db(db, path, dry_run=dry_run)
+    watched = origin_client.client[db]
+    if collection_name is not None:
+        watched = watched[collection_name]
+    Path(path).mkdir(parents=True, exist_ok=True)
+    checkpoint = Checkpoint(Path(path) / name, "sync")
+    state = checkpoint.load()
+    resume = state is not None
+    if state is None:
+        # Taken before the copy, so writes made while copying are replayed.
+        with watched.watch() as stream:
+            state = {"resume_token": stream.resume_token, "copied": False}
+        checkpoint.save(state)
+
+    if not state["copied"]:
+        print(f"Copying '{name}' from '{origin_cluster}' to '{destination_cluster}'.")
+        if collection_name is None:
+            stream_mongo_db(
+                origin_client, destination_client, db, jobs, workers, resume=resume
+            )
+        else:
+            stream_mongo_collection(
+                watched,
+                destination_client.client[db][collection_name],
+                workers=workers,
+                resume=resume,
+                hooks=origin_client.hooks,
+            )
+        state["copied"] = True
+        checkpoint.save(state)
+    else:
+        print(f"Resuming the sync of '{name}' from '{checkpoint.path}'.")
+
+    def save_token(resume_token: dict):
+        state["resume_token"] = resume_token
+        checkpoint.save(state)
+
+    print(f"Tailing the changes of '{name}'. Interrupt to stop.")
+    return tail_changes(
+        watched,
+        destination_client.client[db],
+        state["resume_token"],
+        stop,
+        on_flush=save_token,
+    )
@@ -0,0 +1,366 @@
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Annotated, Callable, Optional
+
+import bson
+import dotenv
+import numpy as np
+import typer
+from pymongo import MongoClient
+from typer import Option
+
+from axolotl.backup_and_restore.client import BackupAndRestoreClient
+from axolotl.backup_and_restore.formats import dump_name
+from axolotl.db_utils.move import move_mongo_collection
+
+# Benchmarks of backup, restore and move against a local mongod, on synthetic
+# collections. Every case runs in a fresh process, after its untimed setup ran
+# in another, so its peak RSS is its own, and results are written to JSON to be compared against a baseline run:
+#
+#   python benchmarks/bench.py run -n 100000 -o results.json
+#   python benchmarks/bench.py compare baseline.json results.json
+#
+# Collections are created in the `axolotl_bench` database (and dropped) on
+# MONGODB_URI, which should be a throwaway local mongod.
+dotenv.load_dotenv()
+BENCH_DB = "axolotl_bench"
+INSERT_BATCH_SIZE = 1000
+
+app = typer.Typer()
+
+
+def flat_document(i: int, rng: np.random.Generator) -> dict:
+    return {
+        "n": i,
+        "name": f"document {i}",
+        "score": float(rng.random()),
+        "active": bool(i % 2),
+        "tag": f"tag-{i % 100}",
+    }
+
+
+def nested_document(i: int, rng: np.random.Generator) -> dict:
+    return {
+        "n": i,
+        "profile": {
+            "name": f"document {i}",
+            "address": {"street": "x" * 40, "city": f"city {i % 1000}"},
+            "history": [
+                {"at": j, "event": "y" * 30, "values": rng.random(8).tolist()}
+                for j in range(20)
+            ],
+        },
+        "text": "lorem ipsum " * 150,
+    }
+
+
+def binary_document(i: int, rng: np.random.Generator) -> dict:
+    return {"n": i, "name": f"blob {i}", "data": rng.bytes(4096)}
+
+
+def vector_document(i: int, rng: np.random.Generator) -> dict:
+    return {
+        "n": i,
+        "text": f"chunk {i}",
+        "embedding": rng.random(768, dtype=np.float32).tolist(),
+    }
+
+
+DATASETS: dict[str, Callable[[int, np.random.Generator], dict]] = {
+    "flat": flat_document,
+    "nested": nested_document,
+    "binary": binary_document,
+    "vectors": vector_document,
+}
+
+
+def generate(client: MongoClient, dataset: str, count: int, seed: int = 0) -> int:
+    """(Re)create the `dataset` collection with `count` documents, returns its BSON size."""
+    collection = client[BENCH_DB][dataset]
+    collection.drop()
+    rng = np.random.default_rng(seed)
+    make = DATASETS[dataset]
+    size = 0
+    for start in range(0, count, INSERT_BATCH_SIZE):
+        batch = [
+            make(i, rng) for i in range(start, min(start + INSERT_BATCH_SIZE, count))
+        ]
+        size += sum(len(bson.encode(document)) for document in batch)
+        collection.insert_many(batch, ordered=False)
+    print(f"Generated {count} '{dataset}' documents ({size / 2**20:.1f} MB).")
+    return size
+
+
+def backup_modes(quick: bool) -> list[dict]:
+    modes = [
+        {"format": format, "compression": compression, "workers": workers}
+        for format in ["json", "extjson", "bson"]
+        for compression in ["none", "gzip", "zstd"]
+        for workers in [1, 4]
+    ]
+    modes.append({"format": "json", "compression": "none", "workers": 1, "index": True})
+    if quick:
+        modes = [mode for mode in modes if mode["workers"] == 1]
+    return modes
+
+
+def restore_modes(quick: bool) -> list[dict]:
+    modes = [
+        {"workers": 1},
+        {"workers": 4},
+        {"workers": 4, "format": "bson"},
+        {"workers": 4, "compression": "gzip"},
+        {"workers": 4, "processes": 2},
+    ]
+    return modes[:2] if quick else modes
+
+
+def move_modes(quick: bool) -> list[dict]:
+    modes = [{"workers": 1}, {"workers": 4}, {"server_side": True}]
+    return modes[:2] if quick else modes
+
+
+def backup_db_modes(quick: bool) -> list[dict]:
+    modes = [
+        {"jobs": 1},
+        {"jobs": 4},
+        {"jobs": 4, "format": "bson"},
+        {"jobs": 4, "format": "extjson", "compression": "gzip"},
+        {"jobs": 4, "chunk_size": 1 << 20},
+        {"jobs": 4, "format": "bson", "compression": "gzip", "chunk_size": 1 << 20},
+    ]
+    return modes[:2] if quick else modes
+
+
+def dump_mode(mode: dict) -> dict:
+    return {key: mode[key] for key in ["format", "compression"] if key in mode}
+
+
+def prepare_case(operation: str, dataset: str, mode: dict, work_dir: str):
+    """Set up what a case needs but does not time. Called in its own process."""
+    client = BackupAndRestoreClient()
+    if operation == "restore_collection":
+        path = str(Path(work_dir) / "dump")
+        client.backup_collection(BENCH_DB, dataset, path, **dump_mode(mode))
+        client.client[BENCH_DB][f"{dataset}_restored"].drop()
+    elif operation == "move_mongo_collection":
+        client.client[f"{BENCH_DB}_moved"][dataset].drop()
+
+
+def run_case(operation: str, dataset: str, mode: dict, work_dir: str) -> dict:
+    """Run one benchmark case, once `prepare_case` did. Called in a fresh process."""
+    client = BackupAndRestoreClient()
+    db = client.client[BENCH_DB]
+    path = Path(work_dir) / "dump"
+
+    start = time.perf_counter()
+    if operation == "backup_collection":
+        documents = client.backup_collection(BENCH_DB, dataset, str(path), **mode)
+    elif operation == "restore_collection":
+        restore_mode = {
+            key: value for key, value in mode.items() if key not in dump_mode(mode)
+        }
+        dump = path / dump_name(
+            dataset, mode.get("format", "json"), mode.get("compression", "none")
+        )
+        documents = client.restore_collection(
+            BENCH_DB, f"{dataset}_restored", str(dump), **restore_mode
+        )
+    elif operation == "move_mongo_collection":
+        move_mongo_collection(BENCH_DB, f"{BENCH_DB}_moved", dataset, **mode)
+        documents = client.client[f"{BENCH_DB}_moved"][
+            dataset
+        ].estimated_document_count()
+    elif operation == "backup_db":
+        summary = client.backup_db(BENCH_DB, str(path), **mode)
+        documents = sum(row["documents"] for row in summary)
+    else:
+        raise ValueError(f"Unknown operation '{operation}'.")
+    seconds = time.perf_counter() - start
+
+    if operation == "backup_db":
+        size = sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+    else:
+        size = db.command("collStats", dataset)["size"]
+    if operation == "restore_collection":
+        db[f"{dataset}_restored"].drop()
+    elif operation == "move_mongo_collection":
+        client.client.drop_database(f"{BENCH_DB}_moved")
+
+    return {
+        "documents": documents,
+        "bytes": size,
+        "seconds": round(seconds, 3),
+        "docs_per_s": round(documents / seconds, 1),
+        "mb_per_s": round(size / 2**20 / seconds, 2),
+        "peak_rss_mb": peak_rss_mb(resource.RUSAGE_SELF),
+        # The largest of the worker processes, like those of `processes`.
+        "peak_children_rss_mb": peak_rss_mb(resource.RUSAGE_CHILDREN),
+    }
+
+
+def peak_rss_mb(who: int) -> float:
+    # ru_maxrss is in kilobytes on Linux, and in bytes on macOS.
+    peak_rss = resource.getrusage(who).ru_maxrss
+    if sys.platform != "darwin":
+        peak_rss *= 1024
+    return round(peak_rss / 2**20, 1)
+
+
+def case_name(operation: str, dataset: str, mode: dict) -> str:
+    options = ",".join(f"{key}={value}" for key, value in sorted(mode.items()))
+    return f"{operation}[{dataset}]({options})"
+
+
+def zstd_available() -> bool:
+    try:
+        import zstandard  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def in_process(function: Callable, *args):
+    """Call `function` in a fresh process, so its peak RSS is its own."""
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(1, mp_context=context) as executor:
+        return executor.submit(function, *args).result()
+
+
+def run_cases(cases: list[tuple[str, str, dict]], repeat: int = 1) -> list[dict]:
+    """
+    Run every `(operation, dataset, mode)` case `repeat` times, each in a
+    fresh process. A case that raises is recorded with its error, and the
+    others still run.
+    """
+    results = []
+    for operation, dataset, mode in cases:
+        name = case_name(operation, dataset, mode)
+        for attempt in range(repeat):
+            work_dir = tempfile.mkdtemp(prefix="axolotl-bench-")
+            try:
+                args = (operation, dataset, mode, work_dir)
+                in_process(prepare_case, *args)
+                result = in_process(run_case, *args)
+            except Exception as e:
+                results.append({"case": name, "attempt": attempt, "error": repr(e)})
+                print(f"{name}: failed with {e!r}.")
+                continue
+            finally:
+                shutil.rmtree(work_dir, ignore_errors=True)
+            results.append({"case": name, "attempt": attempt, **result})
+            print(
+                f"{name}: {result['docs_per_s']} docs/s, "
+                f"{result['mb_per_s']} MB/s, {result['peak_rss_mb']} MB peak RSS "
+                f"({result['peak_children_rss_mb']} MB in workers)."
+            )
+    return results
+
+
+@app.command()
+def run(
+    count: Annotated[int, Option("-n", "--count")] = 10_000,
+    datasets: Annotated[Optional[list[str]], Option("-d", "--dataset")] = None,
+    output: Annotated[str, Option("-o", "--output")] = "bench_results.json",
+    quick: Annotated[bool, Option("--quick")] = False,
+    repeat: Annotated[int, Option("-r", "--repeat")] = 1,
+):
+    """Generate the datasets, run every case and write the results to `output`."""
+    datasets = datasets or list(DATASETS)
+    mongo = MongoClient(os.getenv("MONGODB_URI"))
+    cases = []
+    for dataset in datasets:
+        modes = backup_modes(quick)
+        if not zstd_available():
+            modes = [mode for mode in modes if mode["compression"] != "zstd"]
+        cases += [("backup_collection", dataset, mode) for mode in modes]
+        cases += [
+            ("restore_collection", dataset, mode) for mode in restore_modes(quick)
+        ]
+        cases += [
+            ("move_mongo_collection", dataset, mode) for mode in move_modes(quick)
+        ]
+    cases += [("backup_db", "*", mode) for mode in backup_db_modes(quick)]
+
+    for dataset in datasets:
+        generate(mongo, dataset, count)
+    try:
+        results = run_cases(cases, repeat)
+    finally:
+        mongo.drop_database(BENCH_DB)
+
+    report = {
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "count": count,
+            "batch_size": int(os.getenv("BATCH_SIZE", 512)),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "server": mongo.server_info()["version"],
+        },
+        "results": results,
+    }
+    Path(output).write_text(json.dumps(report, indent=2))
+    print(f"Saved {len(results)} results to '{output}'.")
+    failed = [result for result in results if "error" in result]
+    if failed:
+        print(f"{len(failed)} cases failed.")
+        raise typer.Exit(1)
+
+
+def best_by_case(report: dict) -> dict[str, dict]:
+    best = {}
+    for result in report["results"]:
+        if "error" in result:
+            continue
+        if (
+            result["case"] not in best
+            or result["seconds"] < best[result["case"]]["seconds"]
+        ):
+            best[result["case"]] = result
+    return best
+
+
+@app.command()
+def compare(
+    baseline: str,
+    results: str,
+    threshold: Annotated[float, Option("-t", "--threshold")] = 0.1,
+):
+    """Compare the best run of every case to a baseline; fail on a slowdown over `threshold`."""
+    base = best_by_case(json.loads(Path(baseline).read_text()))
+    new = best_by_case(json.loads(Path(results).read_text()))
+    regressions = 0
+    for case in sorted(base.keys() & new.keys()):
+        ratio = new[case]["docs_per_s"] / base[case]["docs_per_s"]
+        rss = new[case]["peak_rss_mb"] - base[case]["peak_rss_mb"]
+        workers_rss = new[case].get("peak_children_rss_mb", 0) - base[case].get(
+            "peak_children_rss_mb", 0
+        )
+        flag = ""
+        if ratio < 1 - threshold:
+            flag = "  <- slower"
+            regressions += 1
+        print(
+            f"{case}: {ratio:.2f}x docs/s, {rss:+.1f} MB peak RSS, "
+            f"{workers_rss:+.1f} MB in workers{flag}"
+        )
+    for case in sorted(base.keys() - new.keys()):
+        print(f"{case}: missing from or failed in '{results}'")
+    if regressions:
+        print(f"{regressions} cases are more than {threshold:.0%} slower.")
+        raise typer.Exit(1)
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,54 @@
+import asyncio
+import json
+import os
+import shutil
+from pathlib import Path
+
+import dotenv
+import pytest
+from pymongo import MongoClient
+
+from axolotl.backup_and_restore import async_client
+from axolotl.backup_and_restore.async_client import AsyncBackupAndRestoreClient
+
+dotenv.load_dotenv()
+
+
+class TestAsyncBackupAndRestore:
+    @pytest.fixture(autouse=True)
+    def setup_collection(self, monkeypatch):
+        monkeypatch.setattr(async_client, "BATCH_SIZE", 3)
+        self.client = MongoClient(os.getenv("MONGODB_URI"))
+        self.collection = self.client["test_db_utils"]["axolotl"]
+        self.collection.insert_many([{"name": f"axolotl_{i}"} for i in range(10)])
+        yield
+        self.client.drop_database("test_db_utils")
+        shutil.rmtree(Path("./tmp/"), ignore_errors=True)
+
+    def test_backup_and_restore_collection(self):
+        async def run():
+            client = AsyncBackupAndRestoreClient(concurrency=2)
+            backed_up = await client.backup_collection(
+                "test_db_utils", "axolotl", "./tmp/"
+            )
+            self.collection.delete_many({})
+            restored = await client.restore_collection(
+                "test_db_utils", "axolotl", "./tmp/axolotl.jsonl", workers=2
+            )
+            return backed_up, restored
+
+        assert asyncio.run(run()) == (10, 10)
+        assert self.collection.count_documents({}) == 10
+        with open("./tmp/axolotl.jsonl.checkpoint.json") as f:
+            assert json.load(f)["complete"]
+
+    def test_backup_and_restore_db(self):
+        async def run():
+            client = AsyncBackupAndRestoreClient()
+            await client.backup_db("test_db_utils", "./tmp/")
+            self.collection.delete_many({})
+            return await client.restore_db("test_db_utils", "./tmp/")
+
+        summary = asyncio.run(run())
+        assert [row["documents"] for row in summary] == [10]
+        assert self.collection.count_documents({}) == 10
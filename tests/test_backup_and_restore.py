@@ -1,5 +1,8 @@
+import json
 import os
 import shutil
+from datetime import datetime, timedelta
+from functools import partial
 from pathlib import Path
 from typing import Optional
 
@@ -8,6 +11,7 @@ import pytest
 from pymongo import MongoClient
 from redb.core import Document, MongoConfig, RedB
 
+from axolotl.backup_and_restore import client
 from axolotl.backup_and_restore.client import BackupAndRestoreClient
 
 
@@ -87,6 +91,62 @@ class TestBackupAndRestore:
         with open("./tmp/dog.jsonl") as f:
             assert len(f.readlines()) == 5
 
+    def test_backup_collection_twice(self):
+        for _ in range(2):
+            self.backup_client.backup_collection(
+                db="test_db_utils", collection="dog", path="./tmp/"
+            )
+        with open("./tmp/dog.jsonl") as f:
+            assert len(f.readlines()) == 5
+        with open("./tmp/dog.jsonl.checkpoint.json") as f:
+            state = json.load(f)
+        assert state["documents"] == 5
+        assert state["chunks"][0]["documents"] == 5
+
+    def test_backup_collection_no_match(self):
+        self.backup_client.backup_collection(
+            db="test_db_utils", collection="dog", path="./tmp/"
+        )
+        backed_up = self.backup_client.backup_collection(
+            db="test_db_utils",
+            collection="dog",
+            path="./tmp/",
+            filters={"age": {"$gt": 100}},
+        )
+        assert backed_up == 0
+        assert not Path("./tmp/dog.jsonl").exists()
+        assert client.list_dumps("./tmp/") == [("dog", Path("tmp/dog.metadata.json"))]
+
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_backup_collection_mixed_ids(self, monkeypatch, workers):
+        monkeypatch.setattr(client, "BATCH_SIZE", 2)
+        collection = MongoClient(os.getenv("MONGODB_URI"))["test_db_utils"]["dog"]
+        collection.insert_many(
+            [{"_id": i, "name": f"int_{i}"} for i in range(5)]
+            + [{"_id": f"dog_{i}", "name": f"str_{i}"} for i in range(5)]
+        )
+        backed_up = self.backup_client.backup_collection(
+            db="test_db_utils", collection="dog", path="./tmp/", workers=workers
+        )
+        assert backed_up == 15
+        with open("./tmp/dog.jsonl") as f:
+            assert len(f.readlines()) == 15
+
+    def test_backup_collection_paginated(self, monkeypatch):
+        monkeypatch.setattr(client, "BATCH_SIZE", 2)
+        self.backup_client.backup_collection(
+            db="test_db_utils",
+            collection="dog",
+            path="./tmp/",
+            offset=1,
+            limit=3,
+            dry_run=False,
+        )
+        with open("./tmp/dog.jsonl") as f:
+            ids = [json.loads(line)["_id"] for line in f]
+        all_ids = sorted(dog.id for dog in Dog.find_many())
+        assert ids == all_ids[1:4]
+
     def test_restore_collection(self):
         self.backup_client.backup_collection(
             db="test_db_utils",
@@ -102,3 +162,217 @@ class TestBackupAndRestore:
             dry_run=False,
         )
         assert len(Dog.find_many()) == 5
+
+    def test_backup_and_restore_partitioned(self):
+        self.backup_client.backup_collection(
+            db="test_db_utils",
+            collection="dog",
+            path="./tmp/",
+            workers=2,
+            dry_run=False,
+        )
+        with open("./tmp/dog.manifest.json") as f:
+            manifest = json.load(f)
+        assert manifest["documents"] == 5
+        Dog.delete_many({})
+        self.backup_client.restore_collection(
+            db="test_db_utils",
+            collection="dog",
+            path="./tmp/dog.manifest.json",
+            dry_run=False,
+        )
+        assert len(Dog.find_many()) == 5
+
+    def test_backup_collection_partitioned_filter(self):
+        backed_up = self.backup_client.backup_collection(
+            db="test_db_utils",
+            collection="dog",
+            path="./tmp/",
+            filters={"age": {"$gte": 3}},
+            workers=2,
+        )
+        assert backed_up == 2
+        with open("./tmp/dog.manifest.json") as f:
+            assert json.load(f)["documents"] == 2
+
+    def test_backup_and_restore_db(self):
+        summary = self.backup_client.backup_db(
+            db="test_db_utils", path="./tmp/", jobs=2
+        )
+        assert {"collection": "dog", "documents": 5} in [
+            {k: row[k] for k in ("collection", "documents")} for row in summary
+        ]
+        Dog.delete_many({})
+        self.backup_client.restore_db(db="test_db_utils", path="./tmp/", jobs=2)
+        assert len(Dog.find_many()) == 5
+
+    def test_backup_and_restore_db_chunked(self, monkeypatch):
+        monkeypatch.setattr(client, "BATCH_SIZE", 2)
+        self.backup_client.backup_db(db="test_db_utils", path="./tmp/", chunk_size=1)
+        with open("./tmp/test_db_utils/manifest.json") as f:
+            manifest = json.load(f)
+        (dog,) = [c for c in manifest["collections"] if c["collection"] == "dog"]
+        assert dog["documents"] == 5
+        assert len(dog["chunks"]) > 1
+        assert all(len(chunk["sha256"]) == 64 for chunk in dog["chunks"])
+        Dog.delete_many({})
+        self.backup_client.restore_db(db="test_db_utils", path="./tmp/", jobs=3)
+        assert len(Dog.find_many()) == 5
+
+        Dog.delete_many({})
+        with open(f"./tmp/test_db_utils/{dog['chunks'][0]['file']}", "ab") as f:
+            f.write(b"\n")
+        with pytest.raises(RuntimeError):
+            self.backup_client.restore_db(db="test_db_utils", path="./tmp/")
+
+    def test_backup_db_replaces_other_layouts(self):
+        self.backup_client.backup_db(db="test_db_utils", path="./tmp/", chunk_size=1)
+        self.backup_client.backup_db(db="test_db_utils", path="./tmp/")
+        assert not list(Path("./tmp/test_db_utils").glob("dog.chunk-*"))
+        Dog.delete_many({})
+        self.backup_client.restore_db(db="test_db_utils", path="./tmp/")
+        assert len(Dog.find_many()) == 5
+
+    @pytest.mark.skipif(
+        not os.getenv("S3_TEST_URL"), reason="needs an S3 bucket, e.g. a local MinIO"
+    )
+    def test_backup_and_restore_db_s3(self):
+        url = os.getenv("S3_TEST_URL")
+        self.backup_client.backup_db(db="test_db_utils", path=url, chunk_size=1)
+        Dog.delete_many({})
+        self.backup_client.restore_db(db="test_db_utils", path=url, jobs=2)
+        assert len(Dog.find_many()) == 5
+
+    def test_backup_collection_query(self):
+        self.backup_client.backup_collection(
+            db="test_db_utils",
+            collection="dog",
+            path="./tmp/",
+            filters={"age": {"$gte": 2}},
+            projection={"color": 0},
+            sort=[("age", -1)],
+        )
+        with open("./tmp/dog.jsonl") as f:
+            documents = [json.loads(line) for line in f]
+        assert [doc["age"] for doc in documents] == [4, 3, 2]
+        assert all("color" not in doc for doc in documents)
+
+    def test_backup_and_restore_indexes(self):
+        collection = MongoClient(os.getenv("MONGODB_URI"))["test_db_utils"]["dog"]
+        collection.create_index([("age", -1), ("breed", 1)], name="age_breed")
+        collection.create_index([("name", "text")], name="name_text")
+        self.backup_client.backup_db(db="test_db_utils", path="./tmp/")
+        collection.drop()
+        self.backup_client.restore_db(
+            db="test_db_utils", path="./tmp/", index_workers=2
+        )
+        assert collection.count_documents({}) == 5
+        indexes = collection.index_information()
+        assert indexes["age_breed"]["key"] == [("age", -1), ("breed", 1)]
+        assert "name_text" in indexes
+
+    def test_restore_collection_pipelined(self, monkeypatch):
+        monkeypatch.setattr(client, "BATCH_SIZE", 2)
+        self.backup_client.backup_collection(
+            db="test_db_utils",
+            collection="dog",
+            path="./tmp/",
+            dry_run=False,
+        )
+        Dog.delete_many({})
+        restored = self.backup_client.restore_collection(
+            db="test_db_utils",
+            collection="dog",
+            path="./tmp/dog.jsonl",
+            workers=3,
+            write_concern="majority",
+            dry_run=False,
+        )
+        assert restored == 5
+        assert len(Dog.find_many()) == 5
+
+    def test_backup_collection_resume(self, monkeypatch):
+        monkeypatch.setattr(client, "BATCH_SIZE", 2)
+        write = client.DumpWriter.write
+        calls = []
+
+        def crashing_write(*args, **kwargs):
+            calls.append(1)
+            if len(calls) == 2:
+                raise ConnectionError("flaky link")
+            return write(*args, **kwargs)
+
+        monkeypatch.setattr(client.DumpWriter, "write", crashing_write)
+        with pytest.raises(ConnectionError):
+            self.backup_client.backup_collection(
+                db="test_db_utils", collection="dog", path="./tmp/"
+            )
+        self.backup_client.backup_collection(
+            db="test_db_utils", collection="dog", path="./tmp/", resume=True
+        )
+        with open("./tmp/dog.jsonl") as f:
+            ids = [json.loads(line)["_id"] for line in f]
+        assert ids == sorted(dog.id for dog in Dog.find_many())
+
+        Dog.delete_many({})
+        for _ in range(2):
+            self.backup_client.restore_collection(
+                db="test_db_utils",
+                collection="dog",
+                path="./tmp/dog.jsonl",
+                resume=True,
+            )
+        assert len(Dog.find_many()) == 5
+
+    def test_backup_and_restore_compressed(self):
+        self.backup_client.backup_collection(
+            db="test_db_utils",
+            collection="dog",
+            path="./tmp/",
+            compression="gzip",
+        )
+        Dog.delete_many({})
+        self.backup_client.restore_collection(
+            db="test_db_utils", collection="dog", path="./tmp/dog.jsonl.gz"
+        )
+        assert len(Dog.find_many()) == 5
+
+    @pytest.mark.parametrize(
+        "dump_format, file", [("bson", "dog.bson"), ("extjson", "dog.extjson.jsonl")]
+    )
+    def test_backup_and_restore_lossless(self, dump_format, file):
+        collection = MongoClient(os.getenv("MONGODB_URI"))["test_db_utils"]["dog"]
+        before = sorted(collection.find(), key=lambda doc: doc["_id"])
+        self.backup_client.backup_collection(
+            db="test_db_utils", collection="dog", path="./tmp/", format=dump_format
+        )
+        Dog.delete_many({})
+        self.backup_client.restore_collection(
+            db="test_db_utils", collection="dog", path=f"./tmp/{file}"
+        )
+        assert sorted(collection.find(), key=lambda doc: doc["_id"]) == before
+
+    def test_backup_and_restore_incremental(self):
+        collection = MongoClient(os.getenv("MONGODB_URI"))["test_db_utils"]["dog"]
+        backup = partial(
+            self.backup_client.backup_collection_incremental,
+            db="test_db_utils",
+            collection="dog",
+            path="./tmp/",
+            watermark_field="updated_at",
+        )
+        assert backup() == 5
+        first = collection.find_one({"age": 0})
+        collection.update_one(
+            {"_id": first["_id"]},
+            {"$set": {"age": 10, "updated_at": datetime.now() + timedelta(hours=1)}},
+        )
+        backup()
+        with open("./tmp/dog.incremental.json") as f:
+            assert json.load(f)["deltas"][0]["file"] == "dog.delta-0001.extjson.jsonl"
+        Dog.delete_many({})
+        self.backup_client.restore_collection_incremental(
+            db="test_db_utils", collection="dog", path="./tmp/"
+        )
+        assert collection.count_documents({}) == 5
+        assert collection.find_one({"_id": first["_id"]})["age"] == 10
@@ -0,0 +1,51 @@
+from axolotl.backup_and_restore.batching import BatchSizer, iter_sized_batches
+from axolotl.backup_and_restore.formats import DumpWriter
+
+
+def test_fast_batches_grow():
+    sizer = BatchSizer(100, max_size=300, target_seconds=1.0)
+    sizer.observe(100, 10_000, 0.1)
+    assert sizer.next_size() == 200
+    sizer.observe(200, 20_000, 0.1)
+    assert sizer.next_size() == 300
+
+
+def test_slow_batches_shrink():
+    sizer = BatchSizer(100, target_seconds=1.0)
+    sizer.observe(100, 10_000, 1.25)
+    assert sizer.next_size() == 80
+    sizer.observe(80, 8_000, 10.0)
+    assert sizer.next_size() == 40
+    sizer.observe(40, 4_000, 0.75)
+    assert sizer.next_size() == 40
+
+
+def test_partial_batches_keep_the_size():
+    sizer = BatchSizer(100, target_seconds=1.0)
+    sizer.observe(10, 1_000, 0.01)
+    assert sizer.next_size() == 100
+
+
+def test_large_documents_cap_the_size():
+    sizer = BatchSizer(100, max_bytes=1_000_000)
+    sizer.observe(100, 10_000_000, 0.01)
+    assert sizer.next_size() == 10
+    sizer = BatchSizer(100, max_bytes=1_000_000, adaptive=False)
+    sizer.observe(100, 100, 0.01)
+    assert sizer.next_size() == 100
+
+
+def test_iter_sized_batches():
+    records = [b"x" * 10] * 7
+    sizer = BatchSizer(3, adaptive=False)
+    assert [len(b) for b in iter_sized_batches(records, sizer)] == [3, 3, 1]
+    assert [len(b) for b in iter_sized_batches(records, sizer, limit=4)] == [3, 1]
+    sizer = BatchSizer(5, max_bytes=25)
+    assert [len(b) for b in iter_sized_batches(records, sizer)] == [3, 3, 1]
+
+
+def test_dump_writer_counts_encoded_bytes(tmp_path):
+    file = tmp_path / "dog.jsonl.gz"
+    with DumpWriter(file, compression="gzip") as writer:
+        writer.write([{"_id": i, "name": "rex" * 100} for i in range(10)])
+    assert writer.encoded_bytes > file.stat().st_size
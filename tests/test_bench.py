@@ -0,0 +1,41 @@
+import os
+import sys
+from pathlib import Path
+
+import dotenv
+import pytest
+from pymongo import MongoClient
+
+sys.path.insert(0, str(Path(__file__).parents[1] / "benchmarks"))
+import bench  # noqa: E402
+
+dotenv.load_dotenv()
+
+
+class TestBench:
+    @pytest.fixture(autouse=True)
+    def setup_dataset(self):
+        self.client = MongoClient(os.getenv("MONGODB_URI"))
+        bench.generate(self.client, "flat", 20)
+        yield
+        self.client.drop_database(bench.BENCH_DB)
+
+    def test_run_cases(self):
+        results = bench.run_cases(
+            [
+                ("backup_collection", "flat", {"format": "bson"}),
+                ("restore_collection", "flat", {"workers": 2, "compression": "gzip"}),
+                ("unknown_operation", "flat", {}),
+            ]
+        )
+        backup, restore, failed = results
+        assert backup["documents"] == 20
+        assert restore["case"] == "restore_collection[flat](compression=gzip,workers=2)"
+        assert restore["documents"] == 20
+        assert restore["peak_rss_mb"] > 0
+        assert "peak_children_rss_mb" in restore
+        assert "Unknown operation" in failed["error"]
+        assert list(bench.best_by_case({"results": results})) == [
+            backup["case"],
+            restore["case"],
+        ]
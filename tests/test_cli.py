@@ -0,0 +1,76 @@
+import subprocess
+import sys
+
+import pytest
+from bson import ObjectId
+from typer.testing import CliRunner
+
+from axolotl.backup_and_restore import client
+from axolotl.backup_and_restore.backup_and_restore import (
+    app,
+    parse_hint,
+    parse_query,
+    parse_sort,
+)
+
+
+def test_parse_query():
+    query = parse_query('{"_id": {"$oid": "65a000000000000000000000"}, "age": 3}')
+    assert query == {"_id": ObjectId("65a000000000000000000000"), "age": 3}
+    assert parse_query(None) is None
+
+
+def test_parse_sort_keeps_order():
+    assert parse_sort('{"age": -1, "_id": 1}') == [("age", -1), ("_id", 1)]
+
+
+def test_parse_hint():
+    assert parse_hint("age_-1") == "age_-1"
+    assert parse_hint('{"age": -1}') == [("age", -1)]
+    assert parse_hint(None) is None
+
+
+def test_root_help():
+    help = subprocess.run(
+        [sys.executable, "-m", "axolotl", "--help"],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    # Nothing between the usage line and the options: no description.
+    usage, description = help.split("Options")[0].split("Usage:")[1].split("\n", 1)
+    assert description.strip(" \n╭─") == ""
+    assert "--metrics-file" in help
+
+
+@pytest.mark.parametrize(
+    "args, format",
+    [
+        ([], "json"),
+        (["--incremental"], "extjson"),
+        (["--incremental", "-f", "bson"], "bson"),
+        (["-f", "extjson"], "extjson"),
+    ],
+)
+def test_incremental_backups_default_to_extjson(monkeypatch, args, format):
+    calls = []
+
+    class Client:
+        def backup_db(self, **kwargs):
+            calls.append(("backup_db", kwargs))
+
+        def backup_collection(self, **kwargs):
+            calls.append(("backup_collection", kwargs))
+
+        def backup_collection_incremental(self, **kwargs):
+            calls.append(("backup_collection", kwargs))
+
+    monkeypatch.setattr(client, "BackupAndRestoreClient", Client)
+    runner = CliRunner()
+    for command in (["backup-database"], ["backup-collection", "-c", "dog"]):
+        result = runner.invoke(app, [*command, "-db", "test", "-p", "./tmp/", *args])
+        assert result.exit_code == 0, result.output
+    assert [(name, kwargs["format"]) for name, kwargs in calls] == [
+        ("backup_db", format),
+        ("backup_collection", format),
+    ]
@@ -0,0 +1,63 @@
+import gzip
+
+import pytest
+
+from axolotl.backup_and_restore.compression import (
+    compress_block,
+    detect_compression,
+    iter_decompressed_blocks,
+)
+
+
+def read_blocks(path, compression, **kwargs):
+    return [
+        data.splitlines()[skip:]
+        for data, skip, _ in iter_decompressed_blocks(path, compression, **kwargs)
+    ]
+
+
+def write_blocks(path, compression, blocks):
+    with open(path, "wb") as f:
+        for lines in blocks:
+            data = b"".join(line + b"\n" for line in lines)
+            f.write(compress_block(data, len(lines), compression))
+
+
+@pytest.fixture(params=["gzip", "zstd"])
+def compression(request):
+    if request.param == "zstd":
+        pytest.importorskip("zstandard")
+    return request.param
+
+
+def test_block_lines_round_trip(tmp_path, compression):
+    path = tmp_path / "dog.jsonl"
+    blocks = [[b"1", b"2", b"3"], [b"4", b"5"], [b"6"]]
+    write_blocks(path, compression, blocks)
+    assert detect_compression(path) == compression
+    assert read_blocks(path, compression) == blocks
+
+
+def test_block_lines_offset_and_start(tmp_path, compression):
+    path = tmp_path / "dog.jsonl"
+    write_blocks(path, compression, [[b"1", b"2", b"3"], [b"4", b"5"], [b"6"]])
+    assert read_blocks(path, compression, offset=4) == [[b"5"], [b"6"]]
+    first_end = next(iter_decompressed_blocks(path, compression))[2]
+    resumed = read_blocks(path, compression, start=first_end)
+    assert resumed == [[b"4", b"5"], [b"6"]]
+
+
+def test_gzip_blocks_are_plain_gzip(tmp_path):
+    path = tmp_path / "dog.jsonl.gz"
+    write_blocks(path, "gzip", [[b"1", b"2"], [b"3"]])
+    with gzip.open(path) as f:
+        assert f.read() == b"1\n2\n3\n"
+
+
+def test_truncated_block(tmp_path, compression):
+    path = tmp_path / "dog.jsonl"
+    write_blocks(path, compression, [[b"1", b"2"], [b"3"]])
+    data = path.read_bytes()
+    path.write_bytes(data[:-3])
+    with pytest.raises(ValueError, match="truncated"):
+        read_blocks(path, compression)
@@ -0,0 +1,65 @@
+import pytest
+
+from axolotl.backup_and_restore import connections
+from axolotl.backup_and_restore.client import BackupAndRestoreClient
+
+URI = "mongodb://localhost:27017"
+
+
+@pytest.fixture(autouse=True)
+def clusters_file(tmp_path, monkeypatch):
+    file = tmp_path / "axolotl-clusters.yml"
+    file.write_text(
+        f"local: {URI}\n"
+        "tuned:\n"
+        f"  uri: {URI}/?appName=tuned\n"
+        "  maxPoolSize: 7\n"
+        "  compressors: zlib\n"
+    )
+    monkeypatch.setattr(connections, "CLUSTERS_FILE", str(file))
+    monkeypatch.delenv("MONGODB_MAX_POOL_SIZE", raising=False)
+    monkeypatch.delenv("MONGODB_COMPRESSORS", raising=False)
+    connections.read_clusters.cache_clear()
+    yield
+    connections.close_clients()
+    connections.read_clusters.cache_clear()
+
+
+def test_clients_are_shared():
+    client = connections.get_client("local")
+    assert connections.get_client(URI) is client
+    assert BackupAndRestoreClient("local").client is client
+    assert connections.get_client("local", maxPoolSize=3) is not client
+
+
+def test_cluster_options(monkeypatch):
+    monkeypatch.setenv("MONGODB_MAX_POOL_SIZE", "11")
+    assert connections.get_client("local").options.pool_options.max_pool_size == 11
+    assert connections.get_client("tuned").options.pool_options.max_pool_size == 7
+    uri, options = connections.resolve_cluster("tuned")
+    assert uri == f"{URI}/?appName=tuned"
+    assert options == {"maxPoolSize": 7, "compressors": "zlib"}
+
+
+def test_clusters_file_is_read_once(monkeypatch):
+    connections.read_clusters()
+    monkeypatch.setattr(connections, "CLUSTERS_FILE", "/nonexistent.yml")
+    assert "local" in connections.read_clusters()
+
+
+def test_unknown_cluster():
+    with pytest.raises(KeyError, match="'nope' not found"):
+        connections.get_client("nope")
+
+
+def test_host_cluster(monkeypatch):
+    assert connections.resolve_cluster("localhost:27017") == ("localhost:27017", {})
+    monkeypatch.setattr(connections, "CLUSTERS_FILE", "/nonexistent.yml")
+    connections.read_clusters.cache_clear()
+    client = BackupAndRestoreClient("localhost:27017").client
+    assert client.topology_description.server_descriptions().keys() == {
+        ("localhost", 27017)
+    }
+    assert connections.resolve_cluster("db1.internal,db2.internal")[0] == (
+        "db1.internal,db2.internal"
+    )
@@ -0,0 +1,41 @@
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from axolotl.backup_and_restore.client import iter_dump_batches, save_dump
+from axolotl.backup_and_restore.decoding import iter_decoded_batches
+from axolotl.backup_and_restore.formats import dump_name
+
+DOCUMENTS = [
+    {"_id": ObjectId(), "n": i, "born": datetime(2020, 1, 1)} for i in range(3000)
+]
+
+
+def read_all(batches):
+    return [(list(map(dict, batch)), end) for batch, end in batches]
+
+
+@pytest.mark.parametrize(
+    "format, compression",
+    [("json", "none"), ("extjson", "none"), ("bson", "none"), ("extjson", "gzip")],
+)
+@pytest.mark.parametrize("offset, limit", [(0, -1), (1500, 700)])
+def test_decoded_batches_match_dump_batches(
+    tmp_path, format, compression, offset, limit
+):
+    for i in range(0, len(DOCUMENTS), 1000):
+        save_dump(DOCUMENTS[i : i + 1000], tmp_path, "dog", format, compression)
+    file = tmp_path / dump_name("dog", format, compression)
+    expected = [
+        doc
+        for batch, _ in read_all(iter_dump_batches(file, offset, limit))
+        for doc in batch
+    ]
+    decoded = read_all(
+        iter_decoded_batches(file, offset, limit, processes=2, batch_size=256)
+    )
+    assert [doc for batch, _ in decoded for doc in batch] == expected
+    assert decoded[-1][1] <= file.stat().st_size
+    if limit == -1:
+        assert decoded[-1][1] == file.stat().st_size
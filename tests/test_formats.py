@@ -0,0 +1,64 @@
+import io
+from datetime import datetime
+from pathlib import Path
+
+import bson
+import pytest
+from bson import Decimal128, ObjectId
+from bson.raw_bson import RawBSONDocument
+
+from axolotl.backup_and_restore.formats import (
+    decode_record,
+    dump_collection,
+    dump_format,
+    dump_name,
+    encode_documents,
+    read_records,
+    split_records,
+)
+
+DOCUMENTS = [
+    {
+        "_id": ObjectId(),
+        "born": datetime(2020, 1, 1, 12, 30),
+        "blob": b"\x00\xff\xfe",
+        "price": Decimal128("9.99"),
+        "n": i,
+    }
+    for i in range(3)
+]
+
+
+@pytest.mark.parametrize("format", ["extjson", "bson"])
+def test_lossless_round_trip(format):
+    data = encode_documents(DOCUMENTS, format)
+    records = split_records(data, format)
+    assert [dict(decode_record(record, format)) for record in records] == DOCUMENTS
+    assert list(read_records(io.BytesIO(data), format)) == records
+
+
+def test_bson_passes_raw_documents_through():
+    raw = [RawBSONDocument(bson.encode(doc)) for doc in DOCUMENTS]
+    assert encode_documents(raw, "bson") == b"".join(doc.raw for doc in raw)
+
+
+def test_json_is_lossy_but_readable():
+    document = {"_id": DOCUMENTS[0]["_id"], "born": DOCUMENTS[0]["born"]}
+    record = split_records(encode_documents([document], "json"), "json")[0]
+    decoded = decode_record(record, "json")
+    assert decoded["_id"] == str(DOCUMENTS[0]["_id"])
+    assert decoded["born"] == "2020-01-01T12:30:00"
+
+
+@pytest.mark.parametrize(
+    "format, compression, name",
+    [
+        ("json", "none", "dog.jsonl"),
+        ("extjson", "gzip", "dog.extjson.jsonl.gz"),
+        ("bson", "zstd", "dog.bson.zst"),
+    ],
+)
+def test_dump_names(format, compression, name):
+    assert dump_name("dog", format, compression) == name
+    assert dump_format(Path(name)) == format
+    assert dump_collection(Path(name)) == "dog"
@@ -0,0 +1,55 @@
+import pytest
+
+from axolotl.backup_and_restore.formats import DumpWriter, decode_record
+from axolotl.backup_and_restore.index import (
+    MappedDump,
+    RecordIndex,
+    build_index,
+    index_path,
+)
+
+DOCUMENTS = [{"n": i, "text": "x" * (i % 7)} for i in range(100)]
+
+
+@pytest.fixture(params=["json", "bson"])
+def dump(request, tmp_path):
+    file = tmp_path / f"dog.{request.param}"
+    with DumpWriter(file, format=request.param, index=True) as writer:
+        for i in range(0, len(DOCUMENTS), 30):
+            writer.write(DOCUMENTS[i : i + 30])
+    return file, request.param
+
+
+def test_written_index_matches_built_index(dump):
+    file, format = dump
+    written = RecordIndex.load(file)
+    built = build_index(file, format)
+    assert written.records == built.records == 100
+    assert written.size == file.stat().st_size
+    assert written.offsets == built.offsets
+
+
+def small_index(file, format, base=None):
+    return build_index(file, format, base=base or RecordIndex(stride=8))
+
+
+def test_record_offset(dump):
+    file, format = dump
+    index_path(file).unlink()
+    with MappedDump(file, format) as mapped:
+        mapped._index = small_index(file, format)
+        for n in (0, 7, 8, 63, 99):
+            record = next(mapped.iter_records(mapped.record_offset(n)))
+            assert decode_record(record, format)["n"] == n
+        assert mapped.record_offset(100) is None
+
+
+def test_index_after_truncation(dump):
+    file, format = dump
+    with MappedDump(file, format) as mapped:
+        size = mapped.record_offset(50)
+    stale = small_index(file, format)
+    file.write_bytes(file.read_bytes()[:size])
+    index = small_index(file, format, base=stale)
+    assert (index.records, index.size) == (50, size)
+    assert index.offsets == small_index(file, format).offsets
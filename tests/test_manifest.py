@@ -0,0 +1,75 @@
+import json
+
+import pytest
+
+from axolotl.backup_and_restore.checkpoint import Checkpoint
+from axolotl.backup_and_restore.formats import DumpWriter
+from axolotl.backup_and_restore.manifest import (
+    chunk_entry,
+    load_db_manifest,
+    save_collection_manifest,
+    save_db_manifest,
+    stale_dumps,
+    verify_chunk,
+)
+
+
+def write_dump(file, documents):
+    with DumpWriter(file) as writer:
+        writer.write([{"_id": i} for i in range(documents)])
+
+
+def test_verify_chunk(tmp_path):
+    write_dump(tmp_path / "dog.chunk-0000.jsonl", 3)
+    chunk = chunk_entry(tmp_path / "dog.chunk-0000.jsonl", 3, "json", "none")
+    assert chunk["bytes"] == (tmp_path / "dog.chunk-0000.jsonl").stat().st_size
+    verify_chunk(tmp_path, chunk)
+
+    write_dump(tmp_path / "dog.chunk-0000.jsonl", 1)
+    with pytest.raises(ValueError, match="checksum"):
+        verify_chunk(tmp_path, chunk)
+    (tmp_path / "dog.chunk-0000.jsonl").unlink()
+    with pytest.raises(ValueError, match="missing"):
+        verify_chunk(tmp_path, chunk)
+
+
+def test_save_db_manifest(tmp_path):
+    chunks = []
+    for chunk in range(2):
+        file = tmp_path / f"dog.chunk-{chunk:04d}.jsonl"
+        write_dump(file, 2)
+        chunks.append(chunk_entry(file, 2, "json", "none"))
+    save_collection_manifest(tmp_path, "dog", "json", "none", chunks)
+    write_dump(tmp_path / "cat.jsonl", 3)
+    Checkpoint(tmp_path / "cat.jsonl").save({"documents": 3})
+    (tmp_path / "cat.metadata.json").write_text(json.dumps({"indexes": []}))
+
+    save_db_manifest(
+        tmp_path,
+        "pets",
+        [("cat", tmp_path / "cat.jsonl"), ("dog", tmp_path / "dog.manifest.json")],
+    )
+    manifest = load_db_manifest(tmp_path)
+    assert manifest["database"] == "pets"
+    cat, dog = manifest["collections"]
+    assert cat["metadata"] == "cat.metadata.json"
+    assert cat["documents"] == 3
+    assert cat["chunks"][0]["file"] == "cat.jsonl"
+    assert dog["metadata"] is None
+    assert dog["documents"] == 4
+    assert dog["chunks"] == chunks
+    assert load_db_manifest(tmp_path / "missing") is None
+
+
+def test_stale_dumps(tmp_path):
+    stale = [
+        "dog.jsonl",
+        "dog.jsonl.idx",
+        "dog.bson.gz.checkpoint.json",
+        "dog.chunk-0000.jsonl",
+        "dog.part-0001.jsonl",
+        "dog.manifest.json",
+    ]
+    for name in [*stale, "dog.metadata.json", "dogs.jsonl", "cat.manifest.json"]:
+        (tmp_path / name).touch()
+    assert [file.name for file in stale_dumps(tmp_path, "dog")] == sorted(stale)
@@ -0,0 +1,65 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from axolotl.backup_and_restore.checkpoint import Checkpoint
+from axolotl.backup_and_restore.client import dump_files, list_dumps
+from axolotl.backup_and_restore.metadata import (
+    index_models,
+    load_metadata,
+    metadata_file,
+)
+
+INDEXES = [
+    {"v": 2, "key": {"_id": 1}, "name": "_id_"},
+    {"v": 2, "key": {"age": -1}, "name": "age_-1", "unique": True},
+    {
+        "v": 2,
+        "key": {"breed": 1, "_fts": "text", "_ftsx": 1},
+        "name": "breed_1_name_text",
+        "weights": {"name": 1},
+        "default_language": "english",
+    },
+]
+
+
+def test_index_models():
+    models = [model.document for model in index_models(INDEXES)]
+    assert [model["name"] for model in models] == ["age_-1", "breed_1_name_text"]
+    assert dict(models[0]["key"]) == {"age": -1}
+    assert models[0]["unique"] is True
+    assert list(models[1]["key"].items()) == [("breed", 1), ("name", "text")]
+    assert models[1]["weights"] == {"name": 1}
+
+
+def test_metadata_file():
+    assert metadata_file(Path("b/dog.bson.gz")) == Path("b/dog.metadata.json")
+    assert metadata_file(Path("b/dog.manifest.json")) == Path("b/dog.metadata.json")
+    assert metadata_file(Path("b/dog.metadata.json")) == Path("b/dog.metadata.json")
+
+
+def test_collections_without_documents_are_listed(tmp_path):
+    (tmp_path / "dog.jsonl").write_text('{"name": "rex"}\n')
+    (tmp_path / "dog.metadata.json").write_text("{}")
+    (tmp_path / "cat.metadata.json").write_text("{}")
+    dumps = list_dumps(tmp_path)
+    assert dumps == [
+        ("dog", tmp_path / "dog.jsonl"),
+        ("cat", tmp_path / "cat.metadata.json"),
+    ]
+    assert dump_files(tmp_path / "cat.metadata.json") == []
+
+
+def test_load_metadata(tmp_path):
+    metadata = {"collection": "dog", "type": "collection", "options": {}}
+    Checkpoint(tmp_path / "dog", "metadata").save({**metadata, "indexes": INDEXES})
+    assert load_metadata(tmp_path / "dog.bson.gz")["indexes"] == INDEXES
+    assert load_metadata(tmp_path / "cat.jsonl") is None
+
+
+def test_several_layouts_are_refused(tmp_path):
+    (tmp_path / "dog.jsonl").write_text('{"name": "rex"}\n')
+    (tmp_path / "dog.manifest.json").write_text(json.dumps({"parts": []}))
+    with pytest.raises(ValueError, match="several backups of 'dog'"):
+        list_dumps(tmp_path)
@@ -0,0 +1,88 @@
+import json
+
+from axolotl.backup_and_restore.formats import DumpWriter
+from axolotl.backup_and_restore.metrics import (
+    JsonlMetricsFile,
+    Metrics,
+    PrometheusTextfile,
+    add_hook,
+    remove_hook,
+)
+
+
+def test_metrics_events():
+    events = []
+    metrics = Metrics("backup", "dog", total=30, hooks=[events.append])
+    metrics.batch(10, 1000, 0.02)
+    metrics.batch(10, 1000, 3.0)
+    with metrics.timer("fetch"):
+        pass
+    metrics.done()
+
+    assert [event["event"] for event in events] == ["batch", "batch", "done"]
+    last = events[-1]
+    assert last["documents"] == 20
+    assert last["bytes"] == 2000
+    assert last["eta"] is not None
+    assert "fetch" in last["phases"]
+    assert last["latency_buckets"]["0.025"] == 1
+    assert last["latency_buckets"]["5.0"] == 2
+    assert last["latency_buckets"]["+Inf"] == 2
+    assert events[1]["latency"] == 3.0
+
+
+def test_failing_hook_does_not_fail_the_job():
+    def hook(event):
+        raise RuntimeError("down")
+
+    events = []
+    add_hook(hook)
+    try:
+        Metrics("restore", "dog", hooks=[events.append]).batch(1, 10, 0.1)
+    finally:
+        remove_hook(hook)
+    assert len(events) == 1
+
+
+def test_jsonl_metrics_file(tmp_path):
+    file = tmp_path / "metrics.jsonl"
+    metrics = Metrics("move", "dog", hooks=[JsonlMetricsFile(file)])
+    metrics.batch(5, 0, 0.01)
+    metrics.done()
+    events = [json.loads(line) for line in file.read_text().splitlines()]
+    assert [event["event"] for event in events] == ["batch", "done"]
+    assert events[-1]["documents"] == 5
+
+
+def test_prometheus_textfile(tmp_path):
+    file = tmp_path / "axolotl.prom"
+    hook = PrometheusTextfile(file)
+    Metrics("backup", "dog", hooks=[hook]).batch(5, 100, 0.01)
+    Metrics("backup", "cat", hooks=[hook]).batch(7, 100, 0.5)
+    text = file.read_text()
+    assert "# TYPE axolotl_documents_total counter" in text
+    assert 'axolotl_documents_total{operation="backup",collection="dog"} 5' in text
+    assert 'axolotl_documents_total{operation="backup",collection="cat"} 7' in text
+    assert (
+        'axolotl_batch_seconds_bucket{operation="backup",collection="cat",le="0.5"} 1'
+        in text
+    )
+    assert 'axolotl_batch_seconds_count{operation="backup",collection="dog"} 1' in text
+
+
+def test_prometheus_label_values_are_escaped(tmp_path):
+    file = tmp_path / "axolotl.prom"
+    hook = PrometheusTextfile(file)
+    Metrics("backup", 'dog"s\\house\n', hooks=[hook]).batch(5, 100, 0.01)
+    text = file.read_text()
+    assert (
+        'axolotl_documents_total{operation="backup",collection="dog\\"s\\\\house\\n"} 5'
+        in text
+    )
+
+
+def test_dump_writer_phases(tmp_path):
+    metrics = Metrics("backup", "dog")
+    with DumpWriter(tmp_path / "dog.json", compression="gzip") as writer:
+        writer.write([{"n": i} for i in range(100)], metrics)
+    assert set(metrics.phases) == {"serialize", "write"}
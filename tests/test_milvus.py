@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+from pymilvus import CollectionSchema, DataType, FieldSchema
+
+from axolotl.backup_and_restore import milvus
+
+SCHEMA = CollectionSchema(
+    [
+        FieldSchema("pk", DataType.INT64, is_primary=True),
+        FieldSchema("kb_name", DataType.VARCHAR, max_length=64),
+        FieldSchema("vector", DataType.FLOAT_VECTOR, dim=8),
+    ]
+)
+
+
+class FakeIterator:
+    def __init__(self, rows, batch_size):
+        self.rows = rows
+        self.batch_size = batch_size
+
+    def next(self):
+        batch, self.rows = self.rows[: self.batch_size], self.rows[self.batch_size :]
+        return [dict(row) for row in batch]
+
+    def close(self):
+        pass
+
+
+class FakeCollection:
+    """Stands in for a Milvus collection, keeping its rows in memory."""
+
+    collections = {}
+
+    def __init__(self, name, schema=None):
+        self.name = name
+        self.schema = schema or SCHEMA
+        self.rows = self.collections.setdefault(name, [])
+
+    def query_iterator(self, batch_size, limit, expr, output_fields):
+        return FakeIterator(self.rows, batch_size)
+
+    def insert(self, rows):
+        self.rows.extend(rows)
+
+    def flush(self):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def fake_milvus(monkeypatch):
+    monkeypatch.setattr(milvus, "Collection", FakeCollection)
+    monkeypatch.setattr(
+        milvus.utility,
+        "has_collection",
+        lambda name: name in FakeCollection.collections,
+    )
+    rng = np.random.default_rng(0)
+    FakeCollection.collections = {
+        "docs": [
+            {"pk": i, "kb_name": "help", "vector": rng.random(8).tolist()}
+            for i in range(10)
+        ]
+    }
+
+
+def test_backup_and_restore_milvus(tmp_path):
+    assert milvus.backup_milvus_collection("docs", tmp_path, batch_size=3) == 10
+    assert (tmp_path / "docs.vector.f32").stat().st_size == 10 * 8 * 4
+    restored = milvus.restore_milvus_collection(
+        "docs_copy", tmp_path, dump_name="docs", batch_size=4
+    )
+    assert restored == 10
+    original = FakeCollection.collections["docs"]
+    copy = FakeCollection.collections["docs_copy"]
+    assert [row["pk"] for row in copy] == [row["pk"] for row in original]
+    np.testing.assert_array_equal(
+        np.array([row["vector"] for row in copy]),
+        np.array([row["vector"] for row in original], dtype=np.float32),
+    )
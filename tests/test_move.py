@@ -0,0 +1,117 @@
+import os
+import shutil
+import threading
+from functools import partial
+from pathlib import Path
+
+import dotenv
+import pytest
+from pymongo import MongoClient
+
+from axolotl.db_utils import move
+
+dotenv.load_dotenv()
+
+
+class TestMove:
+    @pytest.fixture(autouse=True)
+    def setup_collections(self, monkeypatch):
+        monkeypatch.setattr(move, "BATCH_SIZE", 4)
+        self.client = MongoClient(os.getenv("MONGODB_URI"))
+        self.origin = self.client["test_db_utils"]["cat"]
+        self.destination = self.client["test_db_utils_dest"]["cat"]
+        self.origin.insert_many([{"name": f"cat_{i}", "age": i} for i in range(10)])
+        yield
+        self.client.drop_database("test_db_utils")
+        self.client.drop_database("test_db_utils_dest")
+        shutil.rmtree(Path("./tmp/"), ignore_errors=True)
+
+    def test_stream_mongo_collection(self):
+        moved = move.stream_mongo_collection(self.origin, self.destination, workers=2)
+        assert moved == 10
+        assert sorted(d["age"] for d in self.destination.find()) == list(range(10))
+
+    def test_stream_mongo_collection_hooks(self):
+        events = []
+        move.stream_mongo_collection(
+            self.origin, self.destination, hooks=[events.append]
+        )
+        assert events[-1]["event"] == "done"
+        assert events[-1]["operation"] == "move"
+        assert events[-1]["documents"] == 10
+
+    def test_stream_mongo_collection_spill(self):
+        move.stream_mongo_collection(self.origin, self.destination, path="./tmp/")
+        with open("./tmp/cat.jsonl") as f:
+            assert len(f.readlines()) == 10
+
+    @pytest.mark.parametrize("server_side", [False, True])
+    def test_move_mongo_collection(self, server_side):
+        move.move_mongo_collection(
+            db="test_db_utils",
+            destination_db="test_db_utils_dest",
+            collection_name="cat",
+            server_side=server_side,
+        )
+        assert self.destination.count_documents({}) == 10
+
+    def test_tail_changes(self):
+        with self.origin.watch() as stream:
+            resume_token = stream.resume_token
+        move.stream_mongo_collection(self.origin, self.destination)
+        self.origin.insert_one({"name": "cat_10", "age": 10})
+        self.origin.update_one({"age": 0}, {"$set": {"name": "renamed"}})
+        self.origin.delete_one({"age": 1})
+        stop = threading.Event()
+        threading.Timer(2, stop.set).start()
+        applied = move.tail_changes(
+            self.origin, self.destination.database, resume_token, stop
+        )
+        assert applied == 3
+        assert self.destination.count_documents({}) == 10
+        assert self.destination.find_one({"age": 0})["name"] == "renamed"
+
+    def test_sync_resumes(self, monkeypatch):
+        origin_client = move.BackupAndRestoreClient(os.getenv("MONGODB_URI"))
+
+        class Destination:
+            client = {"test_db_utils": self.destination.database}
+
+        monkeypatch.setattr(
+            move,
+            "BackupAndRestoreClient",
+            lambda cluster: origin_client if cluster == "origin" else Destination(),
+        )
+        copy = move.stream_mongo_collection
+
+        def interrupted_copy(*args, **kwargs):
+            copy(*args, **kwargs)
+            raise ConnectionError("interrupted before the copy was saved")
+
+        monkeypatch.setattr(move, "stream_mongo_collection", interrupted_copy)
+        sync = partial(
+            move.sync_mongo_cluster,
+            "origin",
+            "destination",
+            "test_db_utils",
+            "cat",
+            path="./tmp/",
+        )
+        with pytest.raises(ConnectionError):
+            sync()
+        monkeypatch.setattr(move, "stream_mongo_collection", copy)
+
+        def sync_for(seconds: float) -> int:
+            stop = threading.Event()
+            threading.Timer(seconds, stop.set).start()
+            return sync(stop=stop)
+
+        # The copy is redone over the documents already copied.
+        self.origin.insert_one({"name": "cat_10", "age": 10})
+        assert sync_for(2) == 1
+        assert self.destination.count_documents({}) == 11
+
+        # Tailing carries on after the last change applied.
+        self.origin.update_one({"age": 0}, {"$set": {"name": "renamed"}})
+        assert sync_for(2) == 1
+        assert self.destination.find_one({"age": 0})["name"] == "renamed"
@@ -0,0 +1,38 @@
+import threading
+
+import pytest
+
+from axolotl.backup_and_restore.pipeline import run_pipeline
+
+
+def test_run_pipeline_consumes_every_batch():
+    seen = []
+    lock = threading.Lock()
+
+    def consume(batch: list[int]) -> int:
+        with lock:
+            seen.extend(batch)
+        return len(batch)
+
+    batches = ([i, i + 1] for i in range(0, 100, 2))
+    assert run_pipeline(batches, consume, workers=4) == 100
+    assert sorted(seen) == list(range(100))
+
+
+def test_run_pipeline_raises_consumer_errors():
+    def consume(batch: list[int]) -> int:
+        if 13 in batch:
+            raise ValueError("unlucky")
+        return len(batch)
+
+    with pytest.raises(ValueError, match="unlucky"):
+        run_pipeline(([i] for i in range(1000)), consume, workers=2)
+
+
+def test_run_pipeline_raises_producer_errors():
+    def batches():
+        yield [1]
+        raise KeyError("broken")
+
+    with pytest.raises(KeyError):
+        run_pipeline(batches(), len, workers=2)
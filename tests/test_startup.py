@@ -0,0 +1,49 @@
+import os
+import subprocess
+import sys
+
+# The CLI runs from cron and k8s jobs many times a day, so its startup time
+# is part of every job. The budget is the cumulative import time of the CLI
+# module, as reported by `-X importtime`, without interpreter startup.
+STARTUP_BUDGET_MS = float(os.getenv("AXOLOTL_STARTUP_BUDGET_MS", 300))
+HEAVY_MODULES = ["numpy", "pymilvus", "pymongo", "yaml"]
+
+
+def run_python(code: str, *flags: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *flags, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def test_cli_does_not_import_heavy_modules():
+    code = (
+        "import sys, axolotl.__main__; "
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    assert run_python(code).stdout.strip() == ""
+
+
+def test_cli_import_time_budget():
+    def import_time() -> float:
+        stderr = run_python("import axolotl.__main__", "-X", "importtime").stderr
+        for line in stderr.splitlines():
+            _, cumulative, module = line.split("|")
+            if module.strip() == "axolotl.__main__":
+                return int(cumulative) / 1000
+        raise AssertionError("axolotl.__main__ was not imported.")
+
+    # The best of a few runs, so a busy machine does not fail the test.
+    best = min(import_time() for _ in range(3))
+    assert best < STARTUP_BUDGET_MS, f"CLI imports take {best:.0f}ms."
+
+
+def test_clients_are_imported_on_first_use():
+    code = (
+        "import sys, axolotl; "
+        "assert 'pymongo' not in sys.modules; "
+        "print(axolotl.BackupAndRestoreClient.__module__)"
+    )
+    assert run_python(code).stdout.strip() == "axolotl.backup_and_restore.client"
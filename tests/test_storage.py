@@ -0,0 +1,157 @@
+import threading
+
+import pytest
+
+from axolotl.backup_and_restore.storage import (
+    S3Storage,
+    Storage,
+    Uploader,
+    open_storage,
+    staging_dir,
+)
+
+
+class Body:
+    def __init__(self, data: bytes) -> None:
+        self.data = data
+
+    def read(self) -> bytes:
+        return self.data
+
+
+class FakeS3:
+    """In-memory stand-in for the S3 API calls used by `S3Storage`, like a local MinIO."""
+
+    def __init__(self) -> None:
+        self.objects: dict[tuple, bytes] = {}
+        self.uploads: dict[str, dict] = {}
+        self.requests: list[str] = []
+        self.lock = threading.Lock()
+
+    def log(self, request: str):
+        with self.lock:
+            self.requests.append(request)
+
+    def put_object(self, Bucket, Key, Body):
+        self.log("put_object")
+        self.objects[Bucket, Key] = bytes(Body)
+
+    def create_multipart_upload(self, Bucket, Key):
+        self.log("create_multipart_upload")
+        upload_id = str(len(self.uploads))
+        self.uploads[upload_id] = {}
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self.log("upload_part")
+        self.uploads[UploadId][PartNumber] = bytes(Body)
+        return {"ETag": f"etag-{PartNumber}"}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        self.log("complete_multipart_upload")
+        parts = self.uploads.pop(UploadId)
+        numbers = [part["PartNumber"] for part in MultipartUpload["Parts"]]
+        assert numbers == sorted(parts)
+        self.objects[Bucket, Key] = b"".join(parts[number] for number in numbers)
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.log("abort_multipart_upload")
+        self.uploads.pop(UploadId)
+
+    def get_object(self, Bucket, Key, Range):
+        self.log("get_object")
+        start, end = map(int, Range.removeprefix("bytes=").split("-"))
+        return {"Body": Body(self.objects[Bucket, Key][start : end + 1])}
+
+    def head_object(self, Bucket, Key):
+        return {"ContentLength": len(self.objects[Bucket, Key])}
+
+    def list_objects_v2(self, Bucket, Prefix, MaxKeys=1000):
+        keys = sorted(key for bucket, key in self.objects if bucket == Bucket)
+        keys = [key for key in keys if key.startswith(Prefix)][:MaxKeys]
+        return {"Contents": [{"Key": key} for key in keys]}
+
+
+@pytest.fixture
+def s3():
+    return FakeS3()
+
+
+@pytest.fixture
+def storage(s3):
+    return S3Storage("backups", "nightly/jokes", client=s3, part_size=5, workers=3)
+
+
+def test_multipart_upload(tmp_path, s3, storage):
+    data = bytes(range(256)) * 10
+    (tmp_path / "dog.jsonl").write_bytes(data)
+    storage.upload(tmp_path / "dog.jsonl", "dog.jsonl")
+    assert s3.objects["backups", "nightly/jokes/dog.jsonl"] == data
+    assert s3.requests.count("upload_part") == 512
+    assert "put_object" not in s3.requests
+
+    with storage.open_write("small.json") as writer:
+        writer.write(b"{}")
+    assert s3.objects["backups", "nightly/jokes/small.json"] == b"{}"
+    assert s3.requests[-1] == "put_object"
+
+
+def test_multipart_upload_aborts(s3, storage):
+    with pytest.raises(RuntimeError):
+        with storage.open_write("dog.jsonl") as writer:
+            writer.write(b"0123456789")
+            raise RuntimeError("backup failed")
+    assert s3.requests[-1] == "abort_multipart_upload"
+    assert not s3.uploads
+    assert not storage.exists("dog.jsonl")
+
+
+def test_ranged_download(tmp_path, s3, storage):
+    data = bytes(range(256)) * 3
+    s3.objects["backups", "nightly/jokes/dog.bson"] = data
+    storage.download("dog.bson", tmp_path / "staged" / "dog.bson")
+    assert (tmp_path / "staged" / "dog.bson").read_bytes() == data
+    assert s3.requests.count("get_object") == 154
+    assert storage.read_range("dog.bson", 10, 13) == data[10:13]
+
+
+def test_exists(s3, storage):
+    for key in ["nightly/jokes/a.jsonl", "nightly/jokes/b.json", "nightly/jokes/x/c"]:
+        s3.objects["backups", key] = b""
+    assert storage.exists("b.json")
+    assert not storage.exists("b")
+    assert not storage.exists("x")
+
+
+def test_uploader_deletes_uploaded_files(tmp_path, s3, storage):
+    uploader = Uploader(storage, pending=2)
+    for i in range(5):
+        file = tmp_path / f"dog.chunk-{i:04d}.jsonl"
+        file.write_text(f"{i}\n")
+        uploader.submit(file)
+    uploader.wait()
+    assert sorted(s3.objects) == [
+        ("backups", f"nightly/jokes/dog.chunk-{i:04d}.jsonl") for i in range(5)
+    ]
+    assert not list(tmp_path.glob("*.jsonl"))
+
+
+def test_open_storage(tmp_path):
+    with pytest.raises(ValueError, match="Unsupported"):
+        open_storage("ftp://host/backups")
+    with pytest.raises(ValueError, match="Unsupported"):
+        open_storage(str(tmp_path))
+    assert staging_dir("s3://backups/nightly/jokes/").parts[-3:] == (
+        "backups",
+        "nightly",
+        "jokes",
+    )
+
+
+def test_incomplete_storage():
+    class ReadOnlyStorage(Storage):
+        def download(self, name, file):
+            pass
+
+    with pytest.raises(TypeError, match="abstract"):
+        ReadOnlyStorage()